@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import jwt
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from starlette.datastructures import Headers
+from starlette.types import Scope
+
+from app.core.config import from_settings, settings
+from app.core.rate_limit import client_ip
+
+
+class TokenVerifier:
+    """
+    Verifies bearer JWTs in process and remembers the claims of good tokens.
+
+    Claims are cached in a bounded LRU keyed by the raw token until the
+    token's ``exp``, so a client repeating its token pays for signature
+    verification once. Nothing here touches the database.
+    """
+
+    def __init__(
+        self,
+        secret: str,
+        algorithms: List[str],
+        audience: Optional[str] = None,
+        issuer: Optional[str] = None,
+        leeway: float = 0.0,
+        max_tokens: int = 10000,
+    ):
+        self.secret = secret
+        self.algorithms = algorithms
+        self.audience = audience
+        self.issuer = issuer
+        self.leeway = leeway
+        self.max_tokens = max_tokens
+        self._claims: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cached(self, token: str) -> Optional[dict]:
+        """Claims of a previously verified, unexpired token, or None."""
+        with self._lock:
+            entry = self._claims.get(token)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._claims[token]
+                return None
+            self._claims.move_to_end(token)
+            return claims
+
+    def verify(self, token: str) -> dict:
+        """Return the token's claims; raises ``jwt.InvalidTokenError`` if it is not acceptable."""
+        claims = self.cached(token)
+        if claims is not None:
+            return claims
+        claims = jwt.decode(
+            token,
+            self.secret,
+            algorithms=self.algorithms,
+            audience=self.audience,
+            issuer=self.issuer,
+            leeway=self.leeway,
+            options={"require": ["exp", "sub"]},
+        )
+        with self._lock:
+            self._claims[token] = (claims, claims["exp"] + self.leeway)
+            if len(self._claims) > self.max_tokens:
+                self._claims.popitem(last=False)
+        return claims
+
+
+token_verifier = from_settings(lambda: TokenVerifier(
+    settings.JWT_SECRET,
+    [settings.JWT_ALGORITHM],
+    audience=settings.JWT_AUDIENCE,
+    issuer=settings.JWT_ISSUER,
+    leeway=settings.JWT_LEEWAY_SECONDS,
+    max_tokens=settings.AUTH_TOKEN_CACHE_SIZE,
+))
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+# Both dependencies are async so they run on the event loop instead of
+# taking a threadpool hop on every request.
+
+async def current_user_id(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> int:
+    """The user id (``sub`` claim) of the request's bearer token."""
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    try:
+        claims = token_verifier.verify(credentials.credentials)
+        return int(claims["sub"])
+    except (jwt.InvalidTokenError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+async def path_user_id(user_id: int, current: int = Depends(current_user_id)) -> int:
+    """The ``{user_id}`` path parameter, provided it belongs to the caller."""
+    if user_id != current:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to access another user's data")
+    return user_id
+
+
+def rate_limit_identity(scope: Scope) -> str:
+    """Key rate limits by user for tokens already verified here, by address otherwise."""
+    scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+    claims = token_verifier.cached(token) if scheme.lower() == "bearer" and token else None
+    return f"user:{claims['sub']}" if claims is not None else client_ip(scope)
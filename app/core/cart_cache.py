@@ -0,0 +1,54 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from app.core.config import from_settings, settings
+
+# Cached body for a user whose cart has no items (served as a 404).
+EMPTY_CART = b""
+
+
+class CartCache:
+    """
+    Per-user cache of serialized cart responses.
+
+    Entries are keyed by a digest of the user's cart lines as stored in the
+    database (id, product, quantity and row version) plus the version of
+    each product they point at, which the caller reads on every request.
+    Any change to the cart or to a product in it, whichever worker or
+    background job makes it, changes the digest, so a stale body is never
+    served and tags stay valid across restarts and between workers. A hit
+    skips building and serializing the body, but not that one indexed read.
+    """
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._entries: "OrderedDict[int, Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def state(lines: Iterable[tuple]) -> str:
+        """Digest of ``(id, product_id, quantity, version, product_version)`` rows in id order."""
+        return hashlib.sha1(repr([tuple(line) for line in lines]).encode()).hexdigest()[:16]
+
+    def etag(self, user_id: int, state: str) -> str:
+        return f'"cart-{user_id}-{state}"'
+
+    def get(self, user_id: int, state: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != state:
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def put(self, user_id: int, state: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[user_id] = (state, body)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+
+cart_cache = from_settings(lambda: CartCache(settings.CART_CACHE_MAX_USERS))
@@ -1,12 +1,177 @@
+import threading
+from typing import Callable, Dict, List, Optional, TypeVar
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     APP_NAME: str = "Commerce Service"
     APP_VERSION: str = "1.0"
     DATABASE_URL: str
+    DATABASE_REPLICA_URLS: List[str] = []
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_HEALTH_CHECK_INTERVAL: float = 5.0
+    CART_SHARD_URLS: List[str] = []
+    CATEGORY_DISCOUNTS: Dict[str, float] = {}
+    CATEGORY_TAX_RATES: Dict[str, float] = {}
+    DEFAULT_TAX_RATE: float = 0.0
+    PROMOTION_CACHE_TTL: float = 30.0
+    JOB_QUEUE_BACKEND: str = "memory"  # memory, database
+    JOB_WORKERS: int = 4
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BACKOFF: float = 1.0
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_LEASE_SECONDS: float = 60.0
+    JOB_SHUTDOWN_TIMEOUT: float = 10.0
+    OUTBOX_SINK: str = "log"  # log, queue, file:<path>
+    OUTBOX_BATCH_SIZE: int = 500
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    CART_TTL_SECONDS: float = 30 * 24 * 3600
+    CART_SWEEP_INTERVAL: float = 300.0
+    CART_SWEEP_BATCH_SIZE: int = 500
+    CART_SWEEP_MAX_BATCHES: int = 20
+    ORDER_RETENTION_DAYS: float = 180
+    ORDER_ARCHIVE_INTERVAL: float = 3600.0
+    ORDER_ARCHIVE_BATCH_SIZE: int = 1000
+    ORDER_ARCHIVE_MAX_BATCHES: int = 50
+    ORDER_SETTLE_GRACE_SECONDS: float = 60.0
+    ANALYTICS_EXPORT_DIR: str = "exports/sales"
+    ANALYTICS_EXPORT_INTERVAL: float = 300.0
+    ANALYTICS_EXPORT_BATCH_SIZE: int = 10000
+    RECOMMENDATIONS_PATH: str = "exports/co_purchases.npz"
+    RECOMMENDATIONS_TOP_K: int = 20
+    RECOMMENDATIONS_REFRESH_INTERVAL: float = 300.0
+    RECOMMENDATIONS_BATCH_SIZE: int = 10000
+    RECOMMENDATIONS_MAX_BASKET: int = 50
+    LOW_STOCK_THRESHOLDS: Dict[str, int] = {}
+    LOW_STOCK_DEFAULT_THRESHOLD: int = 5
+    LOW_STOCK_REFRESH_INTERVAL: float = 60.0
+    LOW_STOCK_ALERT_INTERVAL: float = 30.0
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_DEFAULT: str = "600/minute"
+    RATE_LIMITS: Dict[str, str] = {
+        "GET /shop/products": "300/minute",
+        "POST /shop/cart": "120/minute",
+        "PUT /shop/cart": "120/minute",
+        "POST /shop/cart/pay": "10/minute",
+    }
     PAYMENT_PROVIDER_KEY: str
+    PAYMENT_PROVIDER_URL: str = "http://localhost:8001"
+    PAYMENT_CURRENCY: str = "USD"
+    PAYMENT_TIMEOUT_SECONDS: float = 10.0
+    PAYMENT_CONNECT_TIMEOUT_SECONDS: float = 2.0
+    PAYMENT_MAX_CONNECTIONS: int = 50
+    PAYMENT_MAX_CONCURRENCY: int = 20
+    PAYMENT_BREAKER_THRESHOLD: int = 5
+    PAYMENT_BREAKER_RESET_SECONDS: float = 30.0
+    PAYMENT_PROVIDER_NAME: str = "default"
+    PAYMENT_PENDING_SECONDS: float = 900.0
+    PAYMENT_ATTEMPT_SECONDS: float = 300.0
+    PAYMENT_RECONCILE_INTERVAL: float = 60.0
+    PAYMENT_RECONCILE_BATCH_SIZE: int = 100
+    PAYMENT_RECONCILE_MAX_BATCHES: int = 10
     JWT_SECRET: str
+    JWT_ALGORITHM: str = "HS256"
+    JWT_AUDIENCE: Optional[str] = None
+    JWT_ISSUER: Optional[str] = None
+    JWT_LEEWAY_SECONDS: float = 0.0
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    CART_CACHE_MAX_USERS: int = 10000
+    CART_WRITE_BEHIND: bool = False
+    CART_WRITE_BEHIND_INTERVAL_MS: int = 500
+    CART_WRITE_BEHIND_LOCK_PATH: str = "cart-write-behind.lock"
+    CATALOG_CACHE_MAX_AGE: int = 60
+    CATALOG_PAGE_CACHE_SIZE: int = 256
+    CATALOG_SNAPSHOT: bool = False
+    CATALOG_SNAPSHOT_REFRESH_INTERVAL: float = 2.0
+    CATALOG_SNAPSHOT_FULL_RELOAD_SECONDS: float = 300.0
+    CATALOG_SNAPSHOT_DIR: Optional[str] = None
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
 
     model_config = SettingsConfigDict(env_file=".env")
 
-settings = Settings()
+
+T = TypeVar("T")
+
+_settings: Optional[Settings] = None
+_bound: List["_SettingsBound"] = []
+
+
+def get_settings() -> Settings:
+    """The active settings, read from the environment on first use."""
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
+
+
+def use_settings(instance: Settings) -> None:
+    """
+    Install ``instance`` as the active settings. Every ``from_settings``
+    singleton is dropped and rebuilt from it on next use, so call this
+    before the app starts serving, not while it runs.
+    """
+    global _settings
+    _settings = instance
+    for bound in _bound:
+        bound.reset()
+
+
+class _LazySettings:
+    """
+    Stands in for the ``Settings`` instance so that importing a module does
+    not read (or fail on) the environment; attribute access resolves
+    ``get_settings()`` at that point.
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(get_settings(), name, value)
+
+
+settings = _LazySettings()
+
+
+class _SettingsBound:
+    """Proxy for a singleton built by ``build`` from the active settings on first use."""
+
+    def __init__(self, build: Callable[[], object]):
+        object.__setattr__(self, "_build", build)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def resolve(self):
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    instance = self._build()
+                    object.__setattr__(self, "_instance", instance)
+        return instance
+
+    def reset(self) -> None:
+        with self._lock:
+            object.__setattr__(self, "_instance", None)
+
+    def __getattr__(self, name: str):
+        return getattr(self.resolve(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self.resolve(), name, value)
+
+
+def from_settings(build: Callable[[], T]) -> T:
+    """
+    A module-level singleton that reads the settings when first used rather
+    than at import, and is rebuilt after ``use_settings``. Hold on to the
+    returned proxy, not to attributes or bound methods taken from it.
+    """
+    bound = _SettingsBound(build)
+    _bound.append(bound)
+    return bound  # type: ignore[return-value]
@@ -1,23 +1,52 @@
 import logging
+import math
+import time
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from fastapi import Depends, Request, Response
 
-from app.core.config import settings
+from app.core.config import from_settings, get_settings, settings
+from app.core.replicas import ReplicaRouter
+from app.core.sharding import ShardSessions, ShardSet
 
 logger = logging.getLogger(__name__)
 
-try:
-    engine = create_engine(
-        settings.DATABASE_URL,
-        pool_pre_ping=True
-    )
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base = declarative_base()
-    logger.info("Database connection pool initialized successfully.")
-except Exception as e:
-    logger.error(f"Failed to create database connection pool: {e}")
-    raise
+Base = declarative_base()
+# Bound by init_engine() at startup. Services hold on to this sessionmaker,
+# so it exists (unbound) before the engine does and is rebound, not replaced.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
+engine = None
+_engine_settings = None
+replica_router = from_settings(lambda: ReplicaRouter(settings.DATABASE_REPLICA_URLS, settings.REPLICA_MAX_LAG_SECONDS))
+cart_shards = from_settings(lambda: ShardSet(settings.CART_SHARD_URLS))
+
+
+def init_engine() -> None:
+    """
+    Create the primary, replica and shard engines for the active settings.
+    A no-op if they already exist; after ``use_settings`` the old primary
+    engine is disposed and everything is created again.
+    """
+    global engine, _engine_settings
+    active = get_settings()
+    if engine is not None and _engine_settings is active:
+        return
+    if engine is not None:
+        engine.dispose()
+    try:
+        engine = create_engine(
+            settings.DATABASE_URL,
+            pool_pre_ping=True
+        )
+        SessionLocal.configure(bind=engine)
+        replica_router.connect()
+        cart_shards.connect()
+        _engine_settings = active
+        logger.info("Database connection pool initialized successfully.")
+    except Exception as e:
+        logger.error(f"Failed to create database connection pool: {e}")
+        raise
 
 def get_db():
     db = SessionLocal()
@@ -25,3 +54,79 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Hold the time until which the client's catalog reads, or its own cart and
+# order reads, stay on the primary.
+CATALOG_PIN_COOKIE = "catalog_pinned_until"
+USER_PIN_COOKIE = "user_reads_pinned_until"
+
+
+def catalog_pin_seconds() -> float:
+    """Long enough for a replica within its lag limit, and the catalog snapshot, to show a write."""
+    seconds = settings.REPLICA_MAX_LAG_SECONDS
+    if settings.CATALOG_SNAPSHOT:
+        seconds = max(seconds, 2 * settings.CATALOG_SNAPSHOT_REFRESH_INTERVAL)
+    return seconds
+
+
+def pin_catalog(response: Response) -> None:
+    """
+    Send the catalog reads of the client that just wrote to the primary for
+    ``catalog_pin_seconds``, so it reads its own write. The pin travels in
+    a cookie, so every other client keeps the replicas and the snapshot.
+    """
+    _pin(response, CATALOG_PIN_COOKIE, catalog_pin_seconds())
+
+
+def pin_user_reads(response: Response) -> None:
+    """
+    Send the cart and order reads of the client that just changed them to
+    the primary for ``REPLICA_MAX_LAG_SECONDS``. Like the catalog pin it is
+    a cookie, so it holds whichever worker serves the next request.
+    """
+    _pin(response, USER_PIN_COOKIE, settings.REPLICA_MAX_LAG_SECONDS)
+
+
+def catalog_pinned(request: Request) -> bool:
+    return _pinned(request, CATALOG_PIN_COOKIE)
+
+
+def _pin(response: Response, cookie: str, seconds: float) -> None:
+    response.set_cookie(
+        cookie, f"{time.time() + seconds:.3f}",
+        max_age=math.ceil(seconds), httponly=True, samesite="lax",
+    )
+
+
+def _pinned(request: Request, cookie: str) -> bool:
+    try:
+        return float(request.cookies.get(cookie, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def get_read_db(request: Request):
+    pinned = catalog_pinned(request) or _pinned(request, USER_PIN_COOKIE)
+    replica = None if pinned else replica_router.choose()
+    db = replica.SessionLocal() if replica is not None else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_cart_shards(db=Depends(get_db)):
+    shards = ShardSessions(cart_shards, db)
+    try:
+        yield shards
+    finally:
+        shards.close()
+
+
+def get_cart_read_shards(db=Depends(get_read_db)):
+    shards = ShardSessions(cart_shards, db)
+    try:
+        yield shards
+    finally:
+        shards.close()
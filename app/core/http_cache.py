@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+# Content codings whose variants get their own strong ETag (see ``encoded_etag``).
+CONTENT_CODINGS = ("br", "gzip")
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """
+    The ETag of a response body sent with ``encoding``. Each content coding
+    is a different representation with different bytes, so a strong tag
+    gets the coding appended (``"products-…-gzip"``); weak tags are left alone.
+    """
+    if encoding is None or etag.startswith("W/"):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def decoded_etag(tag: str) -> str:
+    """``tag`` without the content coding ``encoded_etag`` appended, if any."""
+    for coding in CONTENT_CODINGS:
+        suffix = f'-{coding}"'
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against a current ETag. A
+    tag for any content coding of the current body counts as a match.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (decoded_etag(tag.strip().removeprefix("W/")) for tag in if_none_match.split(","))
+    return any(tag == etag.removeprefix("W/") for tag in candidates)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive timestamps; they are stored as UTC.
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(_as_utc(value), usegmt=True)
+
+
+def is_not_modified(
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    etag: str,
+    last_modified: Optional[datetime] = None,
+) -> bool:
+    """Evaluate conditional GET headers; If-None-Match wins over If-Modified-Since."""
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _as_utc(last_modified) <= _as_utc(since)
+    return False
@@ -0,0 +1,273 @@
+import asyncio
+import inspect
+import logging
+import random
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core import database
+from app.core.config import from_settings, settings
+from app.models.job import DeadLetterJob, Job
+
+logger = logging.getLogger(__name__)
+
+PENDING_JOBS = "pending_jobs"
+
+
+class QueuedJob:
+    __slots__ = ("id", "name", "payload", "attempts")
+
+    def __init__(self, id: Optional[int], name: str, payload: Any, attempts: int = 0):
+        self.id = id
+        self.name = name
+        self.payload = payload
+        self.attempts = attempts
+
+
+class JobQueue:
+    """
+    In-process job queue for work that should not hold up a request.
+
+    ``enqueue`` ties a job to the caller's session: it is handed to the
+    workers only after that session commits and is discarded on rollback.
+    With the ``memory`` backend jobs live in an asyncio queue and are lost if
+    the process dies; with the ``database`` backend they are rows in ``jobs``
+    written in the caller's transaction and claimed by workers under a lease.
+    Either way a fixed number of workers bounds concurrency, failures are
+    retried with exponential backoff, and jobs that exhaust their attempts
+    (or have no handler) are moved to ``dead_letter_jobs``.
+    """
+
+    def __init__(
+        self,
+        backend: str,
+        workers: int,
+        max_attempts: int,
+        retry_backoff: float,
+        poll_interval: float,
+        lease_seconds: float,
+        handlers: Optional[Dict[str, Callable]] = None,
+    ):
+        if backend not in ("memory", "database"):
+            raise ValueError(f"Unknown job queue backend: {backend}")
+        self.backend = backend
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.handlers = handlers if handlers is not None else {}
+        self.stats = {"succeeded": 0, "retried": 0, "dead_lettered": 0}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._waiting: List[QueuedJob] = []
+
+    def handler(self, name: str) -> Callable:
+        def register(fn: Callable) -> Callable:
+            self.handlers[name] = fn
+            return fn
+        return register
+
+    def enqueue(self, db: Session, name: str, payload: Any) -> None:
+        """Queue ``name`` to run once ``db`` commits. Durable jobs need a primary-database session."""
+        if self.backend == "database":
+            db.add(Job(name=name, payload=payload))
+        db.info.setdefault(PENDING_JOBS, []).append(QueuedJob(None, name, payload))
+
+    def _after_commit(self, session: Session) -> None:
+        jobs = session.info.pop(PENDING_JOBS, None)
+        if not jobs:
+            return
+        if self.backend == "database":
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            return
+        for job in jobs:
+            self._submit(job)
+
+    def _submit(self, job: QueuedJob, delay: float = 0.0) -> None:
+        if self._loop is None:
+            self._waiting.append(job)
+        elif delay:
+            self._loop.call_soon_threadsafe(self._loop.call_later, delay, self._queue.put_nowait, job)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+
+    def _backoff(self, attempts: int) -> float:
+        delay = self.retry_backoff * 2 ** (attempts - 1)
+        return delay * (0.5 + random.random() / 2)
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        worker = self._memory_worker if self.backend == "memory" else self._database_worker
+        self._tasks = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        for job in self._waiting:
+            self._queue.put_nowait(job)
+        self._waiting.clear()
+        logger.info(f"Job queue started with {self.workers} {self.backend} workers")
+
+    async def stop(self, timeout: float) -> None:
+        if self.backend == "memory" and self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Job queue stopped with {self._queue.qsize()} jobs still queued")
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+        self._loop = None
+
+    async def _call(self, job: QueuedJob) -> None:
+        handler = self.handlers[job.name]
+        if inspect.iscoroutinefunction(handler):
+            await handler(job.payload)
+        else:
+            await run_in_threadpool(handler, job.payload)
+
+    async def _memory_worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                job.attempts += 1
+                if job.name not in self.handlers:
+                    await run_in_threadpool(self._dead_letter, job, "No handler registered")
+                    continue
+                try:
+                    await self._call(job)
+                except Exception as e:
+                    if job.attempts >= self.max_attempts:
+                        await run_in_threadpool(self._dead_letter, job, repr(e))
+                    else:
+                        self.stats["retried"] += 1
+                        logger.warning(f"Job {job.name} failed (attempt {job.attempts}), retrying: {e}")
+                        self._submit(job, self._backoff(job.attempts))
+                else:
+                    self.stats["succeeded"] += 1
+            except Exception:
+                logger.exception(f"Job {job.name} could not be processed")
+            finally:
+                self._queue.task_done()
+
+    async def _database_worker(self) -> None:
+        while True:
+            try:
+                job = await run_in_threadpool(self._claim)
+                if job is None:
+                    with suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                    self._wakeup.clear()
+                    continue
+                if job.name not in self.handlers:
+                    await run_in_threadpool(self._fail_durable, job, "No handler registered", True)
+                    continue
+                try:
+                    await self._call(job)
+                except Exception as e:
+                    await run_in_threadpool(self._fail_durable, job, repr(e), job.attempts >= self.max_attempts)
+                else:
+                    await run_in_threadpool(self._complete_durable, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job worker failed to poll the jobs table")
+                await asyncio.sleep(self.poll_interval)
+
+    def _claim(self) -> Optional[QueuedJob]:
+        now = datetime.now(timezone.utc)
+        claimable = or_(Job.status == "pending", Job.locked_until < now)
+        with database.SessionLocal() as db:
+            for _ in range(3):
+                job_id = (
+                    db.query(Job.id)
+                    .filter(Job.run_at <= now, claimable)
+                    .order_by(Job.run_at, Job.id)
+                    .limit(1)
+                    .scalar()
+                )
+                if job_id is None:
+                    return None
+                claimed = db.query(Job).filter(Job.id == job_id, claimable).update(
+                    {
+                        "status": "running",
+                        "attempts": Job.attempts + 1,
+                        "locked_until": now + timedelta(seconds=self.lease_seconds),
+                    },
+                    synchronize_session=False,
+                )
+                db.commit()
+                if claimed:
+                    job = db.get(Job, job_id)
+                    return QueuedJob(job.id, job.name, job.payload, job.attempts)
+        return None
+
+    def _complete_durable(self, job: QueuedJob) -> None:
+        with database.SessionLocal() as db:
+            db.query(Job).filter(Job.id == job.id).delete(synchronize_session=False)
+            db.commit()
+        self.stats["succeeded"] += 1
+
+    def _fail_durable(self, job: QueuedJob, error: str, final: bool) -> None:
+        with database.SessionLocal() as db:
+            if final:
+                db.add(DeadLetterJob(name=job.name, payload=job.payload, attempts=job.attempts, error=error))
+                db.query(Job).filter(Job.id == job.id).delete(synchronize_session=False)
+                self.stats["dead_lettered"] += 1
+                logger.error(f"Job {job.name} moved to dead letters after {job.attempts} attempts: {error}")
+            else:
+                db.query(Job).filter(Job.id == job.id).update(
+                    {
+                        "status": "pending",
+                        "run_at": datetime.now(timezone.utc) + timedelta(seconds=self._backoff(job.attempts)),
+                        "locked_until": None,
+                        "last_error": error,
+                    },
+                    synchronize_session=False,
+                )
+                self.stats["retried"] += 1
+                logger.warning(f"Job {job.name} failed (attempt {job.attempts}), retrying: {error}")
+            db.commit()
+
+    def _dead_letter(self, job: QueuedJob, error: str) -> None:
+        with database.SessionLocal() as db:
+            db.add(DeadLetterJob(name=job.name, payload=job.payload, attempts=job.attempts, error=error))
+            db.commit()
+        self.stats["dead_lettered"] += 1
+        logger.error(f"Job {job.name} moved to dead letters after {job.attempts} attempts: {error}")
+
+
+# Handlers register at import, so they outlive a queue rebuilt for new settings.
+_handlers: Dict[str, Callable] = {}
+
+
+def job_handler(name: str) -> Callable:
+    """Register the decorated function as the handler for ``name`` jobs without building the queue."""
+    def register(fn: Callable) -> Callable:
+        _handlers[name] = fn
+        return fn
+    return register
+
+
+job_queue = from_settings(lambda: JobQueue(
+    backend=settings.JOB_QUEUE_BACKEND,
+    workers=settings.JOB_WORKERS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    retry_backoff=settings.JOB_RETRY_BACKOFF,
+    poll_interval=settings.JOB_POLL_INTERVAL,
+    lease_seconds=settings.JOB_LEASE_SECONDS,
+    handlers=_handlers,
+))
+
+event.listen(Session, "after_commit", lambda session: job_queue._after_commit(session))
+event.listen(Session, "after_rollback", lambda session: session.info.pop(PENDING_JOBS, None))
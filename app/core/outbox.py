@@ -0,0 +1,173 @@
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core import database
+from app.core.config import from_settings, settings
+from app.models.outbox import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+def record_event(db: Session, aggregate_type: str, aggregate_id: Any, event_type: str, payload: Any) -> None:
+    """Add an event to ``db``'s transaction; it is published only if that transaction commits."""
+    db.add(OutboxEvent(
+        aggregate_type=aggregate_type,
+        aggregate_id=str(aggregate_id),
+        event_type=event_type,
+        payload=jsonable_encoder(payload),
+    ))
+
+
+class LogSink:
+    def publish(self, events: List[dict]) -> None:
+        for event in events:
+            logger.info(f"outbox {event['event_type']} {event['aggregate_type']}:{event['aggregate_id']}")
+
+
+class FileSink:
+    """Appends events as JSON lines; a stand-in for a broker in development and tests."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def publish(self, events: List[dict]) -> None:
+        lines = "".join(json.dumps(event) + "\n" for event in events)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+class QueueSink:
+    """Hands events to an in-process queue.Queue."""
+
+    def __init__(self, events: Optional[queue.Queue] = None):
+        self.events = events if events is not None else queue.Queue()
+
+    def publish(self, events: List[dict]) -> None:
+        for event in events:
+            self.events.put(event)
+
+
+def make_sink(spec: str):
+    """Build a sink from ``log``, ``queue`` or ``file:<path>``."""
+    if spec == "log":
+        return LogSink()
+    if spec == "queue":
+        return QueueSink()
+    if spec.startswith("file:"):
+        return FileSink(spec[len("file:"):])
+    raise ValueError(f"Unknown outbox sink: {spec}")
+
+
+class OutboxRelay:
+    """
+    Drains unpublished outbox rows in id order, ``batch_size`` at a time,
+    from every database that holds an outbox (the primary and any cart
+    shards). Each batch goes to the sink in one call and is then marked
+    published in a single UPDATE. Delivery is at-least-once: a crash
+    between publishing and marking re-sends that batch, so consumers
+    should de-duplicate on ``(source, id)``; ids are only unique within
+    one source database.
+    """
+
+    def __init__(self, sink, sources: List[sessionmaker], batch_size: int):
+        self.sink = sink
+        self.sources = sources
+        self.batch_size = batch_size
+        self.published_total = 0
+        self.last_run_at: Optional[float] = None
+        self.last_run_published = 0
+        self.last_run_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    def drain_once(self) -> int:
+        started = time.perf_counter()
+        published = 0
+        for index, source in enumerate(self.sources):
+            try:
+                published += self._drain_source(index, source)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.exception("Outbox relay failed to drain a source")
+        self.published_total += published
+        self.last_run_published = published
+        self.last_run_seconds = time.perf_counter() - started
+        self.last_run_at = time.time()
+        return published
+
+    def _drain_source(self, index: int, source: sessionmaker) -> int:
+        published = 0
+        with source() as db:
+            while True:
+                rows = (
+                    db.query(OutboxEvent)
+                    .filter(OutboxEvent.published_at.is_(None))
+                    .order_by(OutboxEvent.id)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                    .all()
+                )
+                if not rows:
+                    break
+                self.sink.publish([
+                    {
+                        "source": index,
+                        "id": row.id,
+                        "aggregate_type": row.aggregate_type,
+                        "aggregate_id": row.aggregate_id,
+                        "event_type": row.event_type,
+                        "payload": row.payload,
+                        "created_at": row.created_at.isoformat(),
+                    }
+                    for row in rows
+                ])
+                db.query(OutboxEvent).filter(OutboxEvent.id.in_([row.id for row in rows])).update(
+                    {"published_at": datetime.now(timezone.utc)},
+                    synchronize_session=False,
+                )
+                db.commit()
+                published += len(rows)
+                if len(rows) < self.batch_size:
+                    break
+        return published
+
+    def metrics(self) -> dict:
+        backlog = 0
+        oldest = None
+        for source in self.sources:
+            with source() as db:
+                count, created = db.query(
+                    func.count(OutboxEvent.id), func.min(OutboxEvent.created_at)
+                ).filter(OutboxEvent.published_at.is_(None)).one()
+            backlog += count
+            if created is not None:
+                if created.tzinfo is None:
+                    created = created.replace(tzinfo=timezone.utc)
+                oldest = created if oldest is None else min(oldest, created)
+        lag = (datetime.now(timezone.utc) - oldest).total_seconds() if oldest is not None else 0.0
+        throughput = self.last_run_published / self.last_run_seconds if self.last_run_seconds else 0.0
+        return {
+            "backlog": backlog,
+            "lag_seconds": max(lag, 0.0),
+            "published_total": self.published_total,
+            "last_run_published": self.last_run_published,
+            "last_run_events_per_second": throughput,
+            "last_run_at": self.last_run_at,
+            "last_error": self.last_error,
+        }
+
+
+outbox_relay = from_settings(lambda: OutboxRelay(
+    make_sink(settings.OUTBOX_SINK),
+    [database.SessionLocal, *database.cart_shards.sessionmakers],
+    settings.OUTBOX_BATCH_SIZE,
+))
@@ -0,0 +1,165 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional; only needed for the shared backend
+    aioredis = None
+
+PERIODS = {"second": 1.0, "minute": 60.0, "hour": 3600.0, "day": 86400.0}
+
+
+def parse_limit(spec: str) -> Tuple[float, float]:
+    """Parse ``"<count>/<period>"`` (e.g. ``"120/minute"``) into (capacity, tokens per second)."""
+    count, _, period = spec.partition("/")
+    seconds = PERIODS.get(period.strip())
+    if seconds is None:
+        raise ValueError(f"Unknown rate limit period in {spec!r}")
+    capacity = float(count)
+    return capacity, capacity / seconds
+
+
+class MemoryBackend:
+    """
+    Token buckets in a bounded LRU of ``key -> [tokens, updated_at]``.
+
+    Evicting a bucket forgets its debt, so an evicted client starts again
+    with a full bucket; ``max_keys`` should comfortably exceed the number of
+    clients active within one refill period.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        """Take one token; return 0 if allowed, otherwise seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                return 0.0
+            return (1.0 - bucket[0]) / rate
+
+
+# Refill and take atomically; buckets expire once they would be full again.
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    """Token buckets shared by every worker through Redis, one round trip per request."""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        if aioredis is None:
+            raise RuntimeError("The redis rate limit backend requires the redis package")
+        self.client = aioredis.from_url(url)
+        self.prefix = prefix
+        self._take = self.client.register_script(TAKE_SCRIPT)
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        wait = await self._take(keys=[self.prefix + key], args=[capacity, rate, time.time()])
+        return float(wait)
+
+
+def make_backend(spec: str, max_keys: int = 100_000):
+    """Build a backend from ``memory`` or a ``redis://`` URL."""
+    if spec == "memory":
+        return MemoryBackend(max_keys)
+    if spec.startswith(("redis://", "rediss://")):
+        return RedisBackend(spec)
+    raise ValueError(f"Unknown rate limit backend: {spec}")
+
+
+def client_ip(scope: Scope) -> str:
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "ip:unknown"
+
+
+class RateLimitMiddleware:
+    """
+    Reject requests over their token-bucket limit with 429 and Retry-After.
+
+    ``limits`` maps ``"<METHOD> <path prefix>"`` to a limit such as
+    ``"60/minute"``; the longest matching prefix wins and ``default`` covers
+    the rest. Each (rule, client) pair has its own bucket, where the client
+    comes from ``identify`` (the peer address by default; run uvicorn with
+    ``--proxy-headers`` behind a load balancer). Nothing here touches the
+    database, so rejected requests never reach the connection pool.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: Dict[str, str],
+        default: str,
+        backend=None,
+        identify: Callable[[Scope], str] = client_ip,
+        exempt: Tuple[str, ...] = ("/health",),
+    ):
+        self.app = app
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.identify = identify
+        self.exempt = exempt
+        self.default = parse_limit(default)
+        rules = []
+        for rule, spec in limits.items():
+            method, _, prefix = rule.partition(" ")
+            rules.append((method.upper(), prefix, rule, parse_limit(spec)))
+        self.rules = sorted(rules, key=lambda rule: len(rule[1]), reverse=True)
+
+    def _match(self, method: str, path: str) -> Tuple[str, Tuple[float, float]]:
+        for rule_method, prefix, name, limit in self.rules:
+            if rule_method == method and path.startswith(prefix):
+                return name, limit
+        return "default", self.default
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"].startswith(self.exempt):
+            await self.app(scope, receive, send)
+            return
+        rule, (capacity, rate) = self._match(scope["method"], scope["path"])
+        wait = await self.backend.take(f"{rule}|{self.identify(scope)}", capacity, rate)
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"retry-after", str(math.ceil(wait)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b'{"detail":"Too many requests"}'})
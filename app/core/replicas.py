@@ -0,0 +1,92 @@
+import itertools
+import logging
+import time
+from typing import List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind the primary; 0 for a primary or unknown dialect.
+LAG_QUERIES = {
+    "postgresql": (
+        "SELECT CASE WHEN pg_is_in_recovery() "
+        "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+        "ELSE 0 END"
+    ),
+}
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.engine = create_engine(url, pool_pre_ping=True)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=self.engine)
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+    def check(self, max_lag_seconds: float) -> None:
+        query = LAG_QUERIES.get(self.engine.dialect.name, "SELECT 0")
+        try:
+            with self.engine.connect() as conn:
+                lag = float(conn.execute(text(query)).scalar() or 0)
+        except Exception as e:
+            self.healthy, self.lag_seconds, self.error = False, None, str(e)
+            logger.warning(f"Replica {self.name} failed health check: {e}")
+        else:
+            self.healthy, self.lag_seconds, self.error = lag <= max_lag_seconds, lag, None
+            if not self.healthy:
+                logger.warning(f"Replica {self.name} is {lag:.1f}s behind; routing reads to the primary")
+        self.checked_at = time.time()
+
+
+class ReplicaRouter:
+    """
+    Round-robins read-only sessions across healthy replicas.
+
+    After a write, the writing client's reads are pinned to the primary by
+    a cookie (see ``database.pin_catalog`` and ``database.pin_user_reads``)
+    for at least ``max_lag_seconds``. Replicas lagging further than that are
+    taken out of rotation by ``check_all``, so the pin window always covers
+    the lag.
+    """
+
+    def __init__(self, urls: List[str], max_lag_seconds: float):
+        self.urls = urls
+        self.replicas: List[Replica] = []
+        self.max_lag_seconds = max_lag_seconds
+        self._cursor = itertools.count()
+
+    def connect(self) -> None:
+        """Create the replica engines; until then every read goes to the primary."""
+        if not self.replicas:
+            self.replicas = [Replica(url) for url in self.urls]
+
+    def choose(self) -> Optional[Replica]:
+        """Return a healthy replica, or None when the read must go to the primary."""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._cursor) % len(healthy)]
+
+    def check_all(self) -> None:
+        for replica in self.replicas:
+            replica.check(self.max_lag_seconds)
+
+    def status(self) -> List[dict]:
+        return [
+            {
+                "replica": replica.name,
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag_seconds,
+                "checked_at": replica.checked_at,
+                "error": replica.error,
+            }
+            for replica in self.replicas
+        ]
@@ -0,0 +1,130 @@
+import logging
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import MetaData, Table, create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+logger = logging.getLogger(__name__)
+
+
+class ShardSet:
+    """
+    A fixed set of databases that user-owned rows are spread across by a
+    stable hash of ``user_id``.
+
+    Row ids are only unique within a shard, so ids handed to clients encode
+    the shard: ``public_id = local_id * shard_count + shard``. With no shard
+    URLs configured the set has a single shard that is the primary database,
+    and public ids equal local ids. The shard count therefore cannot change
+    once rows exist without rewriting those ids.
+
+    The sessionmakers exist from construction so they can be handed out at
+    import time; ``connect`` creates the engines and binds them.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.urls = urls
+        self.engines = []
+        self.sessionmakers = [
+            sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False) for _ in urls
+        ]
+
+    def connect(self) -> None:
+        if self.engines:
+            return
+        self.engines = [create_engine(url, pool_pre_ping=True) for url in self.urls]
+        for factory, engine in zip(self.sessionmakers, self.engines):
+            factory.configure(bind=engine)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.urls)
+
+    @property
+    def count(self) -> int:
+        return len(self.urls) or 1
+
+    def shard_for(self, user_id: int) -> int:
+        return zlib.crc32(str(user_id).encode()) % self.count
+
+    def public_id(self, shard: int, local_id: int) -> int:
+        return local_id * self.count + shard
+
+    def locate(self, public_id: int) -> Tuple[int, int]:
+        """Return ``(shard, local_id)`` for an id issued by ``public_id``."""
+        return public_id % self.count, public_id // self.count
+
+    def create_all(self, tables: List[Table]) -> None:
+        """
+        Create ``tables`` on every shard. Foreign keys are dropped from the
+        shard copies since the tables they point at live on the primary.
+        """
+        metadata = MetaData()
+        copies = []
+        for table in tables:
+            copy = table.to_metadata(metadata)
+            for constraint in list(copy.foreign_key_constraints):
+                copy.constraints.discard(constraint)
+            for column in copy.columns:
+                column.foreign_keys.clear()
+            copies.append(copy)
+        for engine in self.engines:
+            for copy in copies:
+                copy.create(bind=engine, checkfirst=True)
+            logger.info(f"Shard schema ready on {engine.url.render_as_string(hide_password=True)}")
+
+
+class ShardSessions:
+    """
+    Per-request view of a ShardSet. ``catalog`` is the session for the
+    primary (or replica) database holding products; shard sessions are
+    opened lazily and closed with the request. When sharding is disabled
+    the catalog session doubles as the only shard.
+    """
+
+    def __init__(self, shards: ShardSet, catalog: Session):
+        self.shards = shards
+        self.catalog = catalog
+        self._sessions: Dict[int, Session] = {}
+
+    @property
+    def colocated(self) -> bool:
+        """True when shard rows can be joined against catalog tables."""
+        return not self.shards.enabled
+
+    def session(self, shard: int) -> Session:
+        if not self.shards.enabled:
+            return self.catalog
+        db = self._sessions.get(shard)
+        if db is None:
+            db = self._sessions[shard] = self.shards.sessionmakers[shard]()
+        return db
+
+    def for_user(self, user_id: int) -> Session:
+        return self.session(self.shards.shard_for(user_id))
+
+    def locate(self, public_id: int) -> Tuple[Session, int]:
+        shard, local_id = self.shards.locate(public_id)
+        return self.session(shard), local_id
+
+    def public_id(self, user_id: int, local_id: Optional[int]) -> Optional[int]:
+        if local_id is None:
+            return None
+        return self.shards.public_id(self.shards.shard_for(user_id), local_id)
+
+    def commit(self) -> None:
+        """Commit every open shard session, then the catalog session."""
+        for db in self._sessions.values():
+            db.commit()
+        self.catalog.commit()
+
+    def close(self) -> None:
+        for db in self._sessions.values():
+            db.close()
+        self._sessions.clear()
+
+    def release(self) -> None:
+        """End open transactions and hand connections back to the pool; sessions reopen on next use."""
+        self.close()
+        self.catalog.close()
@@ -1,44 +1,189 @@
+import asyncio
+import importlib
 import logging
-from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from contextlib import asynccontextmanager, suppress
+from typing import Optional
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import products, cart
-from app.core.database import Base, engine
-
-Base.metadata.create_all(bind=engine)
+from starlette.concurrency import run_in_threadpool
+from app.core.config import Settings, settings, use_settings
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Imported by create_app, not at module import, so ``import app.main`` stays
+# cheap and the settings passed to create_app are in place before any
+# router, service or model reads them.
+ROUTERS = (
+    "app.routers.products",
+    "app.routers.cart",
+    "app.routers.promotions",
+    "app.routers.analytics",
+    "app.routers.health",
+)
+
+
+async def run_periodically(fn, interval: float):
+    """
+    Run ``fn`` every ``interval`` seconds until cancelled: coroutine
+    functions are awaited, blocking ones run in the threadpool.
+    """
+    while True:
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                await fn()
+            else:
+                await run_in_threadpool(fn)
+        except Exception:
+            logger.exception(f"Periodic task {fn.__qualname__} failed")
+        await asyncio.sleep(interval)
+
+
+def create_schema() -> None:
+    from app.core import database
+    from app.models import job  # noqa: F401  (register the jobs tables)
+    from app.models.cart import Cart
+    from app.models.outbox import OutboxEvent
+
+    database.Base.metadata.create_all(bind=database.engine)
+    database.cart_shards.create_all([Cart.__table__, OutboxEvent.__table__])
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    from app.core import database
+    from app.core.jobs import job_queue
+    from app.core.outbox import outbox_relay
+    from app.services import checkout_jobs  # noqa: F401  (register job handlers)
+    from app.services.cart_buffer import cart_buffer
+    from app.services.cart_sweeper import cart_sweeper
+    from app.services.catalog_snapshot import catalog_snapshot, snapshot_available
+    from app.services.inventory import low_stock
+    from app.services.order_archiver import order_archiver
+    from app.services.payment_reconciler import payment_reconciler
+    from app.services.payments import payment_gateway
+    from app.services.recommendations import co_purchases, recommendations_available
+    from app.services.sales_analytics import analytics_available, sales_exporter
+
     logger.info("Commerce Service is starting up...")
+    await run_in_threadpool(database.init_engine)
+    await run_in_threadpool(create_schema)
+    if settings.CART_WRITE_BEHIND:
+        cart_buffer.claim()
+    background = [
+        asyncio.create_task(run_periodically(outbox_relay.drain_once, settings.OUTBOX_POLL_INTERVAL)),
+        asyncio.create_task(run_periodically(cart_sweeper.sweep_once, settings.CART_SWEEP_INTERVAL)),
+        asyncio.create_task(run_periodically(order_archiver.archive_once, settings.ORDER_ARCHIVE_INTERVAL)),
+        asyncio.create_task(run_periodically(low_stock.refresh, settings.LOW_STOCK_REFRESH_INTERVAL)),
+        asyncio.create_task(run_periodically(low_stock.flush, settings.LOW_STOCK_ALERT_INTERVAL)),
+        asyncio.create_task(run_periodically(payment_reconciler.reconcile_once, settings.PAYMENT_RECONCILE_INTERVAL)),
+    ]
+    if analytics_available():
+        background.append(asyncio.create_task(
+            run_periodically(sales_exporter.export_once, settings.ANALYTICS_EXPORT_INTERVAL)
+        ))
+    if recommendations_available():
+        await run_in_threadpool(co_purchases.load)
+        background.append(asyncio.create_task(
+            run_periodically(co_purchases.refresh, settings.RECOMMENDATIONS_REFRESH_INTERVAL)
+        ))
+    if settings.CATALOG_SNAPSHOT and snapshot_available():
+        await run_in_threadpool(catalog_snapshot.load)
+        background.append(asyncio.create_task(
+            run_periodically(catalog_snapshot.refresh, settings.CATALOG_SNAPSHOT_REFRESH_INTERVAL)
+        ))
+    elif settings.CATALOG_SNAPSHOT:
+        logger.warning("CATALOG_SNAPSHOT is set but numpy is not installed; catalog reads use the database")
+    if settings.CART_WRITE_BEHIND:
+        background.append(asyncio.create_task(
+            run_periodically(cart_buffer.flush, settings.CART_WRITE_BEHIND_INTERVAL_MS / 1000)
+        ))
+    if database.replica_router.replicas:
+        background.append(asyncio.create_task(
+            run_periodically(database.replica_router.check_all, settings.REPLICA_HEALTH_CHECK_INTERVAL)
+        ))
+    await job_queue.start()
     yield
+    await job_queue.stop(settings.JOB_SHUTDOWN_TIMEOUT)
+    for task in background:
+        task.cancel()
+    for task in background:
+        with suppress(asyncio.CancelledError):
+            await task
+    await run_in_threadpool(cart_buffer.flush)
+    await payment_gateway.aclose()
     logger.info("Commerce Service is shutting down...")
 
 
-app = FastAPI(
-    title="Commerce Service",
-    description="A modern, high-performance API for e-commerce operations.",
-    version="1.0.0",
-    lifespan=lifespan,
-)
+def create_app(app_settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Build the application. ``app_settings`` replaces the settings read from
+    the environment; engines are only created when the lifespan starts.
+    """
+    if app_settings is not None:
+        use_settings(app_settings)
 
-app.add_middleware(
-    CORSMiddleware,
-       allow_origins=["http://localhost:4200"],
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE"],
-    allow_headers=["Content-Type", "Authorization"]
-)
+    from sqlalchemy.orm.exc import StaleDataError
+    from app.core.auth import rate_limit_identity
+    from app.core.compression import CompressionMiddleware
+    from app.core.rate_limit import RateLimitMiddleware, make_backend
+
+    app = FastAPI(
+        title="Commerce Service",
+        description="A modern, high-performance API for e-commerce operations.",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+
+    if settings.RATE_LIMIT_ENABLED:
+        # Added first so it sits inside CORS: 429s still carry CORS headers.
+        app.add_middleware(
+            RateLimitMiddleware,
+            limits=settings.RATE_LIMITS,
+            default=settings.RATE_LIMIT_DEFAULT,
+            backend=make_backend(settings.RATE_LIMIT_BACKEND, settings.RATE_LIMIT_MAX_KEYS),
+            identify=rate_limit_identity,
+        )
+
+    app.add_middleware(
+        CORSMiddleware,
+           allow_origins=["http://localhost:4200"],
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "PUT", "DELETE"],
+        allow_headers=["Content-Type", "Authorization"]
+    )
+
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+
+    for module in ROUTERS:
+        app.include_router(importlib.import_module(module).router)
 
-app.include_router(products.router)
-app.include_router(cart.router)
+    @app.exception_handler(StaleDataError)
+    async def stale_data_handler(request: Request, exc: StaleDataError):
+        # A versioned row changed between read and write; the client should reload and retry.
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={"detail": "The resource was modified by another request; reload it and retry"},
+        )
 
+    @app.get("/", tags=["Root"])
+    async def read_root():
+        return {"message": "Commerce Service is running"}
 
+    return app
 
-@app.get("/", tags=["Root"])
-async def read_root():
-    return {"message": "Commerce Service is running"}
 
+def __getattr__(name: str):
+    # ``uvicorn app.main:app`` keeps working: the app is built on first access
+    # rather than at import. ``uvicorn app.main:create_app --factory`` also works.
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
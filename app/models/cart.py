@@ -1,7 +1,8 @@
 from sqlalchemy import (
     Column,
     Integer,
-    # DateTime removed
+    DateTime,
+    literal_column,
     ForeignKey,
     UniqueConstraint,
     CheckConstraint,
@@ -16,9 +17,16 @@ class Cart(Base):
     user_id = Column(Integer, nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, nullable=False, server_default='1')
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now(), index=True)
+    version = Column(Integer, nullable=False, server_default='1', onupdate=literal_column('version + 1'))
 
 
     __table_args__ = (
         UniqueConstraint('user_id', 'product_id', name='_user_product_uc'),
         CheckConstraint('quantity > 0', name='check_quantity_positive'),
     )
+    __mapper_args__ = {
+        "eager_defaults": True,
+        "version_id_col": version,
+        "version_id_generator": False,
+    }
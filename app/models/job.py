@@ -0,0 +1,27 @@
+from sqlalchemy import Column, DateTime, Integer, JSON, String, Text, func
+from app.core.database import Base
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    name = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String, nullable=False, server_default='pending', index=True)  # pending, running
+    attempts = Column(Integer, nullable=False, server_default='0')
+    run_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class DeadLetterJob(Base):
+    __tablename__ = "dead_letter_jobs"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    name = Column(String, nullable=False, index=True)
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False)
+    error = Column(Text, nullable=True)
+    failed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
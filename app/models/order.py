@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Numeric, JSON, ForeignKey
+from sqlalchemy import Column, DateTime, Index, Integer, Numeric, JSON, String, func
 from app.core.database import Base
 
 class Order(Base):
@@ -8,3 +8,46 @@ class Order(Base):
     user_id = Column(Integer, nullable=False, index=True)
     cart = Column(JSON, nullable=False)   # store the whole cart array
     total = Column(Numeric(10, 2), nullable=False)
+    status = Column(String, nullable=False, server_default='PENDING_PAYMENT')  # see schemas.order.OrderStatus
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+    payment_started_at = Column(DateTime(timezone=True), nullable=True)  # latest charge attempt
+    completed_at = Column(DateTime(timezone=True), nullable=True)  # set when payment is confirmed
+
+    __table_args__ = (
+        Index('ix_orders_user_created', 'user_id', 'created_at'),
+        Index('ix_orders_status_created', 'status', 'created_at'),
+        Index('ix_orders_status_completed', 'status', 'completed_at', 'id'),
+    )
+    __mapper_args__ = {"eager_defaults": True}
+
+
+class OrderArchive(Base):
+    """Cold storage for orders older than the retention window; ids are kept from ``orders``."""
+    __tablename__ = "orders_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, nullable=False)
+    cart = Column(JSON, nullable=False)
+    total = Column(Numeric(10, 2), nullable=False)
+    status = Column(String, nullable=False, server_default='COMPLETED')
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_orders_archive_user_created', 'user_id', 'created_at'),
+        Index('ix_orders_archive_status_completed', 'status', 'completed_at', 'id'),
+    )
+
+
+class Payment(Base):
+    # order_id has no foreign key: orders move to orders_archive with their ids intact.
+    __tablename__ = "payments"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    order_id = Column(Integer, nullable=False, index=True)
+    amount = Column(Numeric(10, 2), nullable=False)
+    provider = Column(String, nullable=False)
+    status = Column(String, nullable=False)  # see schemas.order.PaymentStatus
+    transaction_id = Column(String, nullable=True, unique=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, DateTime, Index, Integer, JSON, String, func
+from app.core.database import Base
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    aggregate_type = Column(String, nullable=False)  # order, cart, product
+    aggregate_id = Column(String, nullable=False)
+    event_type = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    published_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Only unpublished rows are indexed, so the relay's scan stays small
+        # however much history the table holds.
+        Index(
+            'ix_outbox_unpublished',
+            'id',
+            postgresql_where=published_at.is_(None),
+            sqlite_where=published_at.is_(None),
+        ),
+    )
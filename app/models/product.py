@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, func
+from sqlalchemy import Column, Index, Integer, String, Numeric, DateTime, func, literal_column
 from app.core.database import Base
 
 
@@ -10,4 +10,19 @@ class Product(Base):
     price = Column(Numeric(10, 2), nullable=False)
     stock = Column(Integer, nullable=False, server_default='0')
     category = Column(String, nullable=False, index=True)  # food, toys, grooming
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, server_default='1', onupdate=literal_column('version + 1'))
 
+    __table_args__ = (
+        Index('ix_products_category_stock', 'category', 'stock'),
+    )
+    # Server defaults and onupdate values come back through RETURNING on the
+    # same INSERT/UPDATE, so nothing needs a refresh after commit. ``version``
+    # is bumped by the UPDATE itself and doubles as the ORM's optimistic
+    # lock: flushed updates and deletes match on it and raise StaleDataError
+    # if another writer got there first.
+    __mapper_args__ = {
+        "eager_defaults": True,
+        "version_id_col": version,
+        "version_id_generator": False,
+    }
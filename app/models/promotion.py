@@ -0,0 +1,24 @@
+from sqlalchemy import Boolean, CheckConstraint, Column, DateTime, ForeignKey, Integer, Numeric, String, func
+from app.core.database import Base
+
+
+class Promotion(Base):
+    __tablename__ = "promotions"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    name = Column(String, nullable=False)
+    kind = Column(String, nullable=False)  # percent_off, buy_x_get_y
+    category = Column(String, nullable=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=True, index=True)
+    percent_off = Column(Numeric(5, 2), nullable=True)
+    buy_quantity = Column(Integer, nullable=True)
+    free_quantity = Column(Integer, nullable=True)
+    active = Column(Boolean, nullable=False, server_default='1')
+    starts_at = Column(DateTime(timezone=True), nullable=True)
+    ends_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        CheckConstraint('category IS NOT NULL OR product_id IS NOT NULL', name='check_promotion_target'),
+    )
+    __mapper_args__ = {"eager_defaults": True}
@@ -0,0 +1,42 @@
+from datetime import date
+from fastapi import APIRouter, HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+
+from app.services.sales_analytics import analytics_available, sales_analytics
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"]
+)
+
+
+def _require_analytics() -> None:
+    if not analytics_available():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Analytics requires numpy and pyarrow to be installed"
+        )
+
+
+@router.get("/top-sellers")
+async def top_sellers(
+    category: Optional[str] = None,
+    limit: int = 10,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+):
+    _require_analytics()
+    return await run_in_threadpool(sales_analytics.top_sellers, category, limit, start, end)
+
+
+@router.get("/revenue-by-day")
+async def revenue_by_day(start: Optional[date] = None, end: Optional[date] = None):
+    _require_analytics()
+    return await run_in_threadpool(sales_analytics.revenue_by_day, start, end)
+
+
+@router.get("/basket-sizes")
+async def basket_sizes(start: Optional[date] = None, end: Optional[date] = None):
+    _require_analytics()
+    return await run_in_threadpool(sales_analytics.basket_sizes, start, end)
@@ -1,23 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
-from typing import List
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, update
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional, Tuple
 from app.models.CartWithProductOut import CartWithProductOut
 
-from app.core.database import get_db
+from app.core.auth import current_user_id, path_user_id
+from app.core.config import settings
+from app.core.cart_cache import EMPTY_CART, cart_cache
+from app.core.database import get_cart_read_shards, get_cart_shards, pin_catalog, pin_user_reads
+from app.core.sharding import ShardSessions
+from app.core.http_cache import etag_matches
+from app.core.jobs import job_queue
+from app.core.outbox import record_event
 from app.models.cart import Cart
 from app.models.product import Product
-from app.schemas.cart import CartCreate, CartOut, CartUpdate
-from app.models.Order import Order
+from app.schemas.cart import CartCreate, CartOut, CartSummaryOut, CartUpdate
+from app.services.cart_buffer import cart_buffer
+from app.services.checkout import (
+    InsufficientStock, complete_payment, order_quantities, payment_key, release_order, start_payment, take_stock
+)
+from app.services.inventory import low_stock
+from app.services.payments import PaymentDeclined, PaymentError, PaymentUnavailable, payment_gateway
+from app.services.pricing import CartTotals, price_cart
+from app.services.promotions import promotion_cache
+from app.models.order import Order, OrderArchive
+from app.schemas.order import OrderHistoryOut, OrderStatus
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/shop/cart",
     tags=["cart"]
 )
 
+def _cart_changed(response: Response) -> None:
+    """Keep the client's next cart and order reads on the primary so it sees its own write."""
+    pin_user_reads(response)
+
+
+def _flush_pending(user_id: int) -> None:
+    """Write a user's buffered quantity changes before their cart is read from the database."""
+    if cart_buffer.has_pending(user_id):
+        cart_buffer.flush(user_id)
+
+
+def _cart_out(shards: ShardSessions, item: Cart) -> CartOut:
+    return CartOut(
+        id=shards.public_id(item.user_id, item.id),
+        user_id=item.user_id,
+        product_id=item.product_id,
+        quantity=item.quantity
+    )
+
+
 @router.post("/", response_model=CartOut, status_code=status.HTTP_201_CREATED)
-def add_item_to_cart(cart: CartCreate, db: Session = Depends(get_db)):
+def add_item_to_cart(
+    cart: CartCreate,
+    response: Response,
+    current: int = Depends(current_user_id),
+    shards: ShardSessions = Depends(get_cart_shards)
+):
+    if cart.user_id != current:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to modify another user's cart")
+
     # Verify product exists
-    product = db.query(Product).filter(Product.id == cart.product_id).first()
+    product = shards.catalog.query(Product).filter(Product.id == cart.product_id).first()
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -25,6 +77,7 @@ def add_item_to_cart(cart: CartCreate, db: Session = Depends(get_db)):
         )
 
     # Check if item is already in the cart for that user
+    db = shards.for_user(cart.user_id)
     existing_item = db.query(Cart).filter(
         Cart.user_id == cart.user_id,
         Cart.product_id == cart.product_id
@@ -38,78 +91,417 @@ def add_item_to_cart(cart: CartCreate, db: Session = Depends(get_db)):
 
     db_cart_item = Cart(**cart.dict())
     db.add(db_cart_item)
+    record_event(db, "cart", cart.user_id, "cart.item_added", cart.dict())
+    db.commit()
+    _cart_changed(response)
+    logger.debug(f"Cart line {db_cart_item.id} added for user {cart.user_id}")
+    return _cart_out(shards, db_cart_item)
+
+
+def _cart_rows(shards: ShardSessions, user_id: int) -> list:
+    """Return ``(cart_item, product_name, price, category)`` rows for a user's cart."""
+    db = shards.for_user(user_id)
+    if shards.colocated:
+        return (
+            db.query(Cart, Product.name, Product.price, Product.category)
+            .join(Product, Product.id == Cart.product_id)
+            .filter(Cart.user_id == user_id)
+            .order_by(Cart.id)
+            .all()
+        )
+    # Carts live on a shard; product details come from the catalog database.
+    items = db.query(Cart).filter(Cart.user_id == user_id).order_by(Cart.id).all()
+    products = {
+        product_id: (name, price, category)
+        for product_id, name, price, category in shards.catalog.query(
+            Product.id, Product.name, Product.price, Product.category
+        ).filter(Product.id.in_({item.product_id for item in items}))
+    }
+    return [(item, *products[item.product_id]) for item in items if item.product_id in products]
+
+
+def _load_cart_items(shards: ShardSessions, user_id: int) -> List[CartWithProductOut]:
+    return [
+        CartWithProductOut(
+            id=shards.public_id(user_id, item.id),
+            user_id=item.user_id,
+            product_id=item.product_id,
+            quantity=item.quantity,
+            product_name=name,
+            price=price
+        )
+        for item, name, price, _ in _cart_rows(shards, user_id)
+    ]
+
+
+def _price_user_cart(shards: ShardSessions, user_id: int) -> CartTotals:
+    return price_cart(
+        (
+            (item.product_id, name, category, price, item.quantity)
+            for item, name, price, category in _cart_rows(shards, user_id)
+        ),
+        promotions=promotion_cache.get(shards.catalog),
+    )
+
+
+def _stock_changed(rows: list) -> None:
+    for product_id, name, category, remaining in rows:
+        low_stock.observe(product_id, name, category, remaining)
+
+
+def _priced_cart(shards: ShardSessions, user_id: int) -> Tuple[CartTotals, list]:
+    """Price the stored cart; the lines come back as an order stores them, so the two can be compared."""
+    _flush_pending(user_id)
+    totals = _price_user_cart(shards, user_id)
+    return totals, jsonable_encoder([line.dict() for line in totals.lines])
+
+
+def _awaiting_payment(shards: ShardSessions, user_id: int, order_id: Optional[int] = None):
+    """The user's newest PENDING_PAYMENT order (``order_id`` if given) as an ``(id, total, cart)`` row, or None."""
+    query = shards.catalog.query(Order.id, Order.total, Order.cart).filter(
+        Order.user_id == user_id,
+        Order.status == OrderStatus.PENDING_PAYMENT.value
+    )
+    if order_id is not None:
+        query = query.filter(Order.id == order_id)
+    return query.order_by(Order.id.desc()).first()
+
+
+def _matches(order, totals: CartTotals, lines: list) -> bool:
+    return order.cart == lines and order.total == totals.total
+
+
+def _reserve_order(shards: ShardSessions, user_id: int, totals: CartTotals, lines: list, response: Response) -> Order:
+    """Take the priced cart's stock and write the order as PENDING_PAYMENT in one transaction."""
+    if not totals.lines:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart not found")
+
+    db = shards.catalog
+    try:
+        stock = take_stock(db, order_quantities(lines))
+    except InsufficientStock as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    new_order = Order(
+        user_id=user_id,
+        cart=lines,
+        total=totals.total,
+        status=OrderStatus.PENDING_PAYMENT.value
+    )
+    db.add(new_order)
+    db.flush()
+    job_queue.enqueue(db, "order.created", {
+        "order_id": new_order.id,
+        "user_id": user_id,
+        "total": str(totals.total),
+    })
+    record_event(db, "order", new_order.id, "order.created", {
+        "order_id": new_order.id,
+        "user_id": user_id,
+        "total": totals.total,
+        "lines": new_order.cart,
+    })
     db.commit()
-    db.refresh(db_cart_item)
-    print("Inserted cart:", db_cart_item.__dict__)
-    return db_cart_item
+    _stock_changed(stock)
+    # The buyer sees the stock it just took; every other client keeps the replicas.
+    pin_catalog(response)
+    # Order history is read from replicas; the new order must show up in it.
+    _cart_changed(response)
+    return new_order
+
+
+def _order_for_cart(shards: ShardSessions, user_id: int, response: Response):
+    """
+    The user's order awaiting payment if it still matches the cart, so
+    placing or paying twice never takes stock twice. If the cart changed
+    since, that order is released and the cart reserved again at current
+    prices, unless a payment for it may be in flight (409).
+    """
+    totals, lines = _priced_cart(shards, user_id)
+    pending = _awaiting_payment(shards, user_id)
+    if pending is not None:
+        if _matches(pending, totals, lines):
+            return pending
+        attempt_cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.PAYMENT_ATTEMPT_SECONDS)
+        returned = release_order(shards.catalog, pending.id, "cart changed before payment", attempt_cutoff)
+        if returned is None:
+            shards.catalog.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"A payment for order {pending.id} is in progress; retry once it completes",
+            )
+        shards.catalog.commit()
+        _cart_changed(response)
+        _stock_changed(returned)
+    return _reserve_order(shards, user_id, totals, lines, response)
+
+
+def _cart_state(shards: ShardSessions, user_id: int) -> str:
+    """
+    Digest of everything the cart body is built from: the user's lines and
+    the version of each product they point at, so a price or name change
+    is a new state just like a quantity change.
+    """
+    db = shards.for_user(user_id)
+    lines = (Cart.id, Cart.product_id, Cart.quantity, Cart.version)
+    if shards.colocated:
+        return cart_cache.state(
+            db.query(*lines, Product.version)
+            .outerjoin(Product, Product.id == Cart.product_id)
+            .filter(Cart.user_id == user_id)
+            .order_by(Cart.id)
+        )
+    rows = db.query(*lines).filter(Cart.user_id == user_id).order_by(Cart.id).all()
+    versions = dict(
+        shards.catalog.query(Product.id, Product.version).filter(Product.id.in_({row.product_id for row in rows}))
+    )
+    return cart_cache.state((*row, versions.get(row.product_id)) for row in rows)
+
+
 @router.get("/{user_id}", response_model=List[CartWithProductOut])
-def get_cart_items(user_id: int, db: Session = Depends(get_db)):
-    cart_items = db.query(Cart).filter(Cart.user_id == user_id).all()
-    if not cart_items:
+def get_cart_items(
+    user_id: int = Depends(path_user_id),
+    if_none_match: Optional[str] = Header(None),
+    shards: ShardSessions = Depends(get_cart_read_shards)
+):
+    _flush_pending(user_id)
+    # The cart's state is read from the database on every request, so a change
+    # made by another worker or a background job is never masked by the cache.
+    # It is read before the body, so a concurrent mutation can only make a
+    # cached body look older than it is, never newer.
+    state = _cart_state(shards, user_id)
+    etag = cart_cache.etag(user_id, state)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    body = cart_cache.get(user_id, state)
+    if body is None:
+        items = _load_cart_items(shards, user_id)
+        body = json.dumps(jsonable_encoder(items)).encode() if items else EMPTY_CART
+        cart_cache.put(user_id, state, body)
+    if body == EMPTY_CART:
+        raise HTTPException(status_code=404, detail="Cart not found")
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/{user_id}/summary", response_model=CartSummaryOut)
+def get_cart_summary(user_id: int = Depends(path_user_id), shards: ShardSessions = Depends(get_cart_read_shards)):
+    _flush_pending(user_id)
+    totals = _price_user_cart(shards, user_id)
+    if not totals.lines:
         raise HTTPException(status_code=404, detail="Cart not found")
-    result = []
-    for item in cart_items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if product:
-            result.append(CartWithProductOut(
-                id=item.id,
-                user_id=item.user_id,
-                product_id=item.product_id,
-                quantity=item.quantity,
-                product_name=product.name,
-                price=product.price
-            ))
-    return result
+    return CartSummaryOut(
+        user_id=user_id,
+        items=[line.dict() for line in totals.lines],
+        item_count=totals.item_count,
+        subtotal=totals.subtotal,
+        discount=totals.discount,
+        tax=totals.tax,
+        total=totals.total
+    )
+
+
+def _stage_quantity(shards: ShardSessions, cart_id: int, user_id: int, quantity: int, response: Response) -> CartOut:
+    """Write-behind path: only the first change to a line between flushes reads the database."""
+    staged = cart_buffer.get(cart_id)
+    if staged is not None and staged[0] == user_id:
+        product_id = staged[1]
+    else:
+        db, local_id = shards.locate(cart_id)
+        line = db.query(Cart.product_id).filter(Cart.id == local_id, Cart.user_id == user_id).first()
+        if line is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart item not found")
+        product_id = line.product_id
+    cart_buffer.stage(cart_id, user_id, product_id, quantity)
+    _cart_changed(response)
+    return CartOut(id=cart_id, user_id=user_id, product_id=product_id, quantity=quantity)
+
+
 @router.put("/{cart_id}", response_model=CartOut)
-def update_cart_item_quantity(cart_id: int, cart_update: CartUpdate, db: Session = Depends(get_db)):
-    db_cart_item = db.query(Cart).filter(Cart.id == cart_id).first()
-    if not db_cart_item:
+def update_cart_item_quantity(
+    cart_id: int,
+    cart_update: CartUpdate,
+    response: Response,
+    current: int = Depends(current_user_id),
+    shards: ShardSessions = Depends(get_cart_shards)
+):
+    if settings.CART_WRITE_BEHIND and cart_update.quantity is not None:
+        return _stage_quantity(shards, cart_id, current, cart_update.quantity, response)
+
+    db, local_id = shards.locate(cart_id)
+    # Another user's line reads as missing rather than forbidden, so ids cannot be probed.
+    owned = (Cart.id == local_id, Cart.user_id == current)
+    if cart_update.quantity is None:
+        db_cart_item = db.query(Cart).filter(*owned).first()
+    else:
+        db_cart_item = db.execute(
+            update(Cart)
+            .where(*owned)
+            .values(quantity=cart_update.quantity)
+            .returning(Cart)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+    if db_cart_item is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart item not found")
 
     if cart_update.quantity is not None:
-        db_cart_item.quantity = cart_update.quantity
+        record_event(db, "cart", current, "cart.item_updated", {
+            "user_id": current,
+            "product_id": db_cart_item.product_id,
+            "quantity": cart_update.quantity,
+        })
         db.commit()
-        db.refresh(db_cart_item)
+        _cart_changed(response)
 
-    return db_cart_item
+    return _cart_out(shards, db_cart_item)
 
 @router.delete("/{cart_id}", status_code=status.HTTP_204_NO_CONTENT)
-def remove_item_from_cart(cart_id: int, db: Session = Depends(get_db)):
-    db_cart_item = db.query(Cart).filter(Cart.id == cart_id).first()
-    if not db_cart_item:
+def remove_item_from_cart(
+    cart_id: int,
+    response: Response,
+    current: int = Depends(current_user_id),
+    shards: ShardSessions = Depends(get_cart_shards)
+):
+    db, local_id = shards.locate(cart_id)
+    removed = db.execute(
+        delete(Cart).where(Cart.id == local_id, Cart.user_id == current).returning(Cart.product_id)
+    ).first()
+    if removed is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart item not found")
 
-    db.delete(db_cart_item)
+    cart_buffer.discard(cart_id)
+    record_event(db, "cart", current, "cart.item_removed", {
+        "user_id": current,
+        "product_id": removed.product_id,
+    })
     db.commit()
+    _cart_changed(response)
     return
 
 
 @router.post("/orders")
-def create_order(order_data: dict, db: Session = Depends(get_db)):
-    new_order = Order(
-        user_id=order_data["userId"],
-        cart=order_data["cart"],   # cart array from frontend
-        total=order_data["total"]
-    )
-    db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
-    return {"message": "Order placed successfully", "order_id": new_order.id}
+def create_order(
+    order_data: dict,
+    response: Response,
+    user_id: int = Depends(current_user_id),
+    shards: ShardSessions = Depends(get_cart_shards)
+):
+    # Lines and total are priced from the stored cart; client-sent totals are ignored.
+    if order_data.get("userId", user_id) != user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to order for another user")
+    order = _order_for_cart(shards, user_id, response)
+    return {"message": "Order placed successfully", "order_id": order.id, "status": OrderStatus.PENDING_PAYMENT}
 
 
+@router.get("/orders/{user_id}", response_model=List[OrderHistoryOut])
+def list_orders(
+    user_id: int = Depends(path_user_id),
+    limit: int = 20,
+    include_archived: bool = False,
+    shards: ShardSessions = Depends(get_cart_read_shards)
+):
+    """
+    A user's orders, newest first. Only the hot ``orders`` table is read
+    unless ``include_archived`` asks for history past the retention window.
+    """
+    db = shards.catalog
+    columns = (Order.id, Order.user_id, Order.total, Order.cart, Order.status, Order.created_at)
+    orders = [
+        OrderHistoryOut(**row._asdict())
+        for row in db.query(*columns)
+        .filter(Order.user_id == user_id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit)
+    ]
+    if include_archived and len(orders) < limit:
+        archived = (
+            db.query(
+                OrderArchive.id, OrderArchive.user_id, OrderArchive.total, OrderArchive.cart,
+                OrderArchive.status, OrderArchive.created_at
+            )
+            .filter(OrderArchive.user_id == user_id)
+            .order_by(OrderArchive.created_at.desc(), OrderArchive.id.desc())
+            .limit(limit - len(orders))
+        )
+        orders.extend(OrderHistoryOut(**row._asdict(), archived=True) for row in archived)
+    return orders
 
-@router.post("/pay/{user_id}")
-async def process_payment(user_id: int, db: Session = Depends(get_db)):
-   
-    db_cart_items = db.query(Cart).filter(Cart.user_id == user_id).all()
 
-    if not db_cart_items:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart is already empty")
+def _order_to_pay(
+    shards: ShardSessions, user_id: int, order_id: Optional[int], response: Response
+) -> Tuple[int, Decimal]:
+    if order_id is None:
+        order = _order_for_cart(shards, user_id, response)
+    else:
+        totals, lines = _priced_cart(shards, user_id)
+        order = _awaiting_payment(shards, user_id, order_id)
+        if order is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No such order awaiting payment")
+        if not _matches(order, totals, lines):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"The cart changed after order {order_id} was placed; place the order again",
+            )
+    # Committed before the charge, so the reconciler knows this order may be being paid.
+    if not start_payment(shards.catalog, order.id):
+        shards.catalog.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Order {order.id} is no longer awaiting payment")
+    shards.catalog.commit()
+    return order.id, order.total
 
-    
-    for item in db_cart_items:
-        db.delete(item)
 
-    db.commit()
-    return {"message": "Payment processed and cart cleared"}
+def _confirm_paid_order(shards: ShardSessions, order_id: int, charge: dict) -> bool:
+    if not complete_payment(shards, order_id, charge):
+        shards.catalog.rollback()
+        return False
+    shards.commit()
+    return True
+
+
+def _release_unpaid_order(shards: ShardSessions, order_id: int, reason: str, response: Response) -> None:
+    returned = release_order(shards.catalog, order_id, reason)
+    shards.catalog.commit()
+    _cart_changed(response)
+    if returned:
+        _stock_changed(returned)
+
+
+@router.post("/pay/{user_id}")
+async def process_payment(
+    response: Response,
+    user_id: int = Depends(path_user_id),
+    order_id: Optional[int] = None,
+    shards: ShardSessions = Depends(get_cart_shards)
+):
+    """
+    Pay for ``order_id``, or for the user's order awaiting payment, which is
+    reserved, or re-priced if the cart changed, from the cart first. An
+    ``order_id`` the cart no longer matches is refused with 409. A declined
+    charge releases the order and its stock; if the provider cannot be
+    reached the order stays PENDING_PAYMENT for a retry or the reconciler.
+    """
+    order_id, total = await run_in_threadpool(_order_to_pay, shards, user_id, order_id, response)
+
+    # No transaction or pooled connection is held while waiting on the provider.
+    shards.release()
+    try:
+        charge = await payment_gateway.charge(user_id, total, settings.PAYMENT_CURRENCY, payment_key(order_id))
+    except PaymentDeclined as exc:
+        await run_in_threadpool(_release_unpaid_order, shards, order_id, str(exc), response)
+        raise HTTPException(status_code=status.HTTP_402_PAYMENT_REQUIRED, detail=str(exc))
+    except PaymentUnavailable as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc))
+    except PaymentError as exc:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc))
 
+    if not await run_in_threadpool(_confirm_paid_order, shards, order_id, charge):
+        logger.error(f"Charge {charge['id']} succeeded for order {order_id}, which was already released; refund it")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Order {order_id} is no longer awaiting payment")
+    _cart_changed(response)
+    return {
+        "message": "Payment processed and cart cleared",
+        "order_id": order_id,
+        "status": OrderStatus.COMPLETED,
+        "transaction_id": charge["id"],
+        "total": total,
+    }
@@ -0,0 +1,68 @@
+from fastapi import APIRouter
+
+from app.core.compression import no_compression
+from app.core.database import replica_router
+from app.core.outbox import outbox_relay
+from app.services.cart_buffer import cart_buffer
+from app.services.cart_sweeper import cart_sweeper
+from app.services.catalog_snapshot import catalog_snapshot
+from app.services.inventory import low_stock
+from app.services.order_archiver import order_archiver
+from app.services.payment_reconciler import payment_reconciler
+from app.services.payments import payment_gateway
+
+router = APIRouter(
+    prefix="/health",
+    tags=["Health"]
+)
+
+
+@router.get("/replicas")
+@no_compression
+async def replica_health():
+    return {
+        "max_lag_seconds": replica_router.max_lag_seconds,
+        "replicas": replica_router.status(),
+    }
+
+
+@router.get("/outbox")
+@no_compression
+def outbox_health():
+    return outbox_relay.metrics()
+
+
+@router.get("/cart-sweeper")
+@no_compression
+async def cart_sweeper_health():
+    return cart_sweeper.metrics()
+
+
+@router.get("/cart-buffer")
+@no_compression
+async def cart_buffer_health():
+    return cart_buffer.metrics()
+
+
+@router.get("/order-archiver")
+@no_compression
+async def order_archiver_health():
+    return order_archiver.metrics()
+
+
+@router.get("/low-stock")
+@no_compression
+async def low_stock_health():
+    return low_stock.metrics()
+
+
+@router.get("/catalog-snapshot")
+@no_compression
+async def catalog_snapshot_health():
+    return catalog_snapshot.metrics()
+
+
+@router.get("/payments")
+@no_compression
+async def payments_health():
+    return {**payment_gateway.metrics(), "reconciler": payment_reconciler.metrics()}
@@ -1,40 +1,205 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import hashlib
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, func, update
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Callable, List, Optional
 
-from app.core.database import get_db
+from app.core.compression import CompressedPageCache, negotiate_encoding
+from app.core.config import from_settings, settings
+from app.core.database import catalog_pinned, get_db, get_read_db, pin_catalog
+from app.core.http_cache import decoded_etag, encoded_etag, http_date, is_not_modified
+from app.core.outbox import record_event
 from app.models.product import Product
 from app.schemas.product import ProductCreate, ProductOut, ProductUpdate
-from app.models.Order import Order
+from app.services.catalog_snapshot import CatalogSnapshot, catalog_snapshot
+from app.services.inventory import low_stock
+from app.services.recommendations import co_purchases, recommendations_available
+
 router = APIRouter(
     prefix="/shop/products",
     tags=["products"]
 )
 
+catalog_pages = from_settings(lambda: CompressedPageCache(
+    settings.CATALOG_PAGE_CACHE_SIZE,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+))
+
+def _conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+) -> Optional[Response]:
+    """Set catalog validators on the response, or return a 304 if the client is current."""
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.CATALOG_CACHE_MAX_AGE}",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if is_not_modified(
+        request.headers.get("if-none-match"),
+        request.headers.get("if-modified-since"),
+        etag,
+        last_modified,
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def _listing_etag(query, *params) -> str:
+    # Aggregated over the rows being served (just the page, for paginated
+    # listings), so a revalidation reads no more than the page itself.
+    # count/sum(id) catch rows entering or leaving, sum(version) catches
+    # updates that land within the timestamp resolution of updated_at.
+    rows = query.subquery()
+    state = query.session.query(
+        func.count(rows.c.id),
+        func.sum(rows.c.id),
+        func.sum(rows.c.version),
+        func.max(rows.c.updated_at),
+    ).one()
+    digest = hashlib.sha1(repr((params, tuple(state))).encode()).hexdigest()[:20]
+    return f'"products-{digest}"'
+
+
+def _catalog_page(
+    request: Request,
+    response: Response,
+    etag: str,
+    load: Callable[[], List[Product]],
+) -> Response:
+    """Serve a listing from the page cache, loading and serializing it only on a miss."""
+    page = catalog_pages.get(etag)
+    if page is None:
+        products = [ProductOut.model_validate(product, from_attributes=True) for product in load()]
+        body = json.dumps(
+            jsonable_encoder(products),
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        page = catalog_pages.put(etag, body)
+
+    content, encoding = catalog_pages.body(page, negotiate_encoding(request.headers.get("accept-encoding")))
+    headers = {
+        "ETag": encoded_etag(response.headers["etag"], encoding),
+        "Cache-Control": response.headers["cache-control"],
+        "Vary": "Accept-Encoding",
+    }
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+def _snapshot(request: Request) -> Optional[CatalogSnapshot]:
+    """
+    The in-memory catalog, if enabled and loaded. A client whose cookie
+    says it just wrote to the catalog skips it, the same way it skips the
+    replicas, so it always reads its own write; other clients are unaffected.
+    """
+    if not settings.CATALOG_SNAPSHOT or catalog_pinned(request):
+        return None
+    return catalog_snapshot.current
+
+
+def _price_filter(query, min_price: Optional[float], max_price: Optional[float]):
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    return query
+
+
+def _product_etag(product_id: int, version: int) -> str:
+    return f'"product-{product_id}-{version}"'
+
+
+def _if_match_versions(if_match: str, product_id: int) -> Optional[List[int]]:
+    """Product versions named by an If-Match header; None for ``*``. Weak tags never match."""
+    if if_match.strip() == "*":
+        return None
+    prefix = f'"product-{product_id}-'
+    versions = []
+    for tag in (decoded_etag(tag.strip()) for tag in if_match.split(",")):
+        version = tag[len(prefix):-1] if tag.startswith(prefix) and tag.endswith('"') else ""
+        if version.isdigit():
+            versions.append(int(version))
+    return versions
+
+
 @router.post("/", response_model=ProductOut, status_code=status.HTTP_201_CREATED)
-def create_product(product: ProductCreate, db: Session = Depends(get_db)):
+def create_product(product: ProductCreate, response: Response, db: Session = Depends(get_db)):
     db_product = Product(**product.dict())
     db.add(db_product)
+    db.flush()
+    record_event(db, "product", db_product.id, "product.created", {"id": db_product.id, **product.dict()})
     db.commit()
-    db.refresh(db_product)
+    pin_catalog(response)
+    low_stock.observe(db_product.id, db_product.name, db_product.category, db_product.stock)
+    response.headers["ETag"] = _product_etag(db_product.id, db_product.version)
     return db_product
 
 
 @router.get("/", response_model=List[ProductOut])
-def read_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    products = db.query(Product).offset(skip).limit(limit).all()
-    return products
+def read_products(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    db: Session = Depends(get_read_db)
+):
+    # Listings carry no Last-Modified: a delete does not move max(updated_at).
+    snapshot = _snapshot(request)
+    if snapshot is not None:
+        etag = snapshot.listing_etag("all", skip, limit, min_price, max_price)
+        load = lambda: snapshot.rows(snapshot.select(None, min_price, max_price)[skip:skip + limit])
+    else:
+        page = _price_filter(db.query(Product), min_price, max_price).order_by(Product.id).offset(skip).limit(limit)
+        etag = _listing_etag(page, "all", skip, limit, min_price, max_price)
+        load = page.all
+    not_modified = _conditional_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+    return _catalog_page(request, response, etag, load)
 
 @router.get("/by-category/{category}", response_model=List[ProductOut])
-def list_products_by_category(category: str, db: Session = Depends(get_db)):
+def list_products_by_category(
+    category: str,
+    request: Request,
+    response: Response,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    db: Session = Depends(get_read_db)
+):
     """
     List products by category (Food, Toys, Grooming).
     """
     allowed = {"Food", "Toys", "Grooming"}
     if category not in allowed:
         raise HTTPException(status_code=400, detail=f"Category must be one of: {', '.join(allowed)}")
-    products = db.query(Product).filter(Product.category == category).all()
-    return products
+    snapshot = _snapshot(request)
+    if snapshot is not None:
+        etag = snapshot.listing_etag("category", category, min_price, max_price)
+        load = lambda: snapshot.rows(snapshot.select(category, min_price, max_price))
+    else:
+        query = _price_filter(db.query(Product).filter(Product.category == category), min_price, max_price)
+        etag = _listing_etag(query, "category", category, min_price, max_price)
+        load = lambda: query.order_by(Product.id).all()
+    not_modified = _conditional_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+    return _catalog_page(request, response, etag, load)
+
 @router.get("/products/", response_model=List[ProductOut])
 def get_products(product_ids: List[int], db: Session = Depends(get_db)):
     products = db.query(Product).filter(Product.id.in_(product_ids)).all()
@@ -42,35 +207,109 @@ def get_products(product_ids: List[int], db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Products not found")
     return products
 
+@router.get("/low-stock")
+async def read_low_stock(category: Optional[str] = None):
+    """Products at or below their category's reorder threshold, from the in-memory tracker."""
+    return low_stock.items(category)
+
+@router.get("/{product_id}/related")
+async def related_products(product_id: int, limit: int = 10):
+    """Products most often bought together with ``product_id``, served from the in-memory model."""
+    if not recommendations_available():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Recommendations require numpy to be installed"
+        )
+    return co_purchases.related(product_id, max(0, min(limit, settings.RECOMMENDATIONS_TOP_K)))
+
 @router.get("/{product_id}", response_model=ProductOut)
-def read_product(product_id: int, db: Session = Depends(get_db)):
+def read_product(
+    product_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db)
+):
+    snapshot = _snapshot(request)
+    if snapshot is not None:
+        pos = snapshot.position(product_id)
+        if pos is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        etag = _product_etag(product_id, snapshot.version(pos))
+        not_modified = _conditional_response(request, response, etag, snapshot.updated_at(pos))
+        if not_modified is not None:
+            return not_modified
+        return snapshot.row(pos)
+
     db_product = db.query(Product).filter(Product.id == product_id).first()
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
+    etag = _product_etag(db_product.id, db_product.version)
+    not_modified = _conditional_response(request, response, etag, db_product.updated_at)
+    if not_modified is not None:
+        return not_modified
     return db_product
 
 @router.put("/{product_id}", response_model=ProductOut)
-def update_product(product_id: int, product: ProductUpdate, db: Session = Depends(get_db)):
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    if db_product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-
+def update_product(
+    product_id: int,
+    product: ProductUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Update a product in one UPDATE ... RETURNING. With If-Match the UPDATE
+    also compares the version, so an edit based on a stale read gets a 409
+    instead of overwriting a newer change; no row lock is taken.
+    """
     update_data = product.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_product, key, value)
+    condition = [Product.id == product_id]
+    if if_match is not None:
+        versions = _if_match_versions(if_match, product_id)
+        if versions is not None:
+            condition.append(Product.version.in_(versions))
+    if update_data:
+        db_product = db.execute(
+            update(Product)
+            .where(*condition)
+            .values(**update_data)
+            .returning(Product)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+    else:
+        # Nothing to change: the current row, with no version bump and no event.
+        db_product = db.query(Product).filter(*condition).first()
+    if db_product is None:
+        current = db.query(Product.version).filter(Product.id == product_id).scalar()
+        if current is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Product was modified by another request; reload it and retry",
+            headers={"ETag": _product_etag(product_id, current)},
+        )
+    if not update_data:
+        response.headers["ETag"] = _product_etag(db_product.id, db_product.version)
+        return db_product
 
-    db.add(db_product)
+    record_event(db, "product", product_id, "product.updated", {"id": product_id, "changes": update_data})
+    if "stock" in update_data:
+        record_event(db, "product", product_id, "product.stock_changed", {"id": product_id, "stock": update_data["stock"]})
     db.commit()
-    db.refresh(db_product)
+    pin_catalog(response)
+    if "stock" in update_data or "category" in update_data:
+        low_stock.observe(db_product.id, db_product.name, db_product.category, db_product.stock)
+    response.headers["ETag"] = _product_etag(db_product.id, db_product.version)
     return db_product
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_product(product_id: int, db: Session = Depends(get_db)):
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    if db_product is None:
+def delete_product(product_id: int, response: Response, db: Session = Depends(get_db)):
+    deleted = db.execute(delete(Product).where(Product.id == product_id).returning(Product.id)).first()
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    db.delete(db_product)
+    record_event(db, "product", product_id, "product.deleted", {"id": product_id})
     db.commit()
+    pin_catalog(response)
+    low_stock.discard(product_id)
     return {"detail": "Product deleted successfully"}
-
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+
+from app.core.database import get_db
+from app.models.promotion import Promotion
+from app.schemas.promotion import PromotionCreate, PromotionOut, PromotionUpdate
+from app.services.promotions import promotion_cache
+
+router = APIRouter(
+    prefix="/shop/promotions",
+    tags=["promotions"]
+)
+
+
+@router.post("/", response_model=PromotionOut, status_code=status.HTTP_201_CREATED)
+def create_promotion(promotion: PromotionCreate, db: Session = Depends(get_db)):
+    db_promotion = Promotion(**promotion.dict())
+    db.add(db_promotion)
+    db.commit()
+    promotion_cache.invalidate()
+    return db_promotion
+
+
+@router.get("/", response_model=List[PromotionOut])
+def read_promotions(active_only: bool = False, db: Session = Depends(get_db)):
+    query = db.query(Promotion)
+    if active_only:
+        query = query.filter(Promotion.active.is_(True))
+    return query.order_by(Promotion.id).all()
+
+
+@router.put("/{promotion_id}", response_model=PromotionOut)
+def update_promotion(promotion_id: int, promotion: PromotionUpdate, db: Session = Depends(get_db)):
+    db_promotion = db.query(Promotion).filter(Promotion.id == promotion_id).first()
+    if db_promotion is None:
+        raise HTTPException(status_code=404, detail="Promotion not found")
+
+    for key, value in promotion.dict(exclude_unset=True).items():
+        setattr(db_promotion, key, value)
+
+    db.commit()
+    promotion_cache.invalidate()
+    return db_promotion
+
+
+@router.delete("/{promotion_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_promotion(promotion_id: int, db: Session = Depends(get_db)):
+    db_promotion = db.query(Promotion).filter(Promotion.id == promotion_id).first()
+    if db_promotion is None:
+        raise HTTPException(status_code=404, detail="Promotion not found")
+
+    db.delete(db_promotion)
+    db.commit()
+    promotion_cache.invalidate()
+    return
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 
 class CartBase(BaseModel):
@@ -19,3 +19,25 @@ class CartOut(CartBase):
 
     class Config:
         orm_mode = True
+
+
+class CartLineOut(BaseModel):
+    product_id: int
+    product_name: str
+    category: str
+    quantity: int
+    unit_price: float
+    line_subtotal: float
+    discount: float
+    tax: float
+    line_total: float
+    promotion: Optional[str] = None
+
+class CartSummaryOut(BaseModel):
+    user_id: int
+    items: List[CartLineOut]
+    item_count: int
+    subtotal: float
+    discount: float
+    tax: float
+    total: float
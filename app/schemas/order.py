@@ -1,5 +1,6 @@
+from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Any, List, Optional
 
 from enum import Enum
 
@@ -25,6 +26,19 @@ class OrderOut(OrderBase):
     id: int
 
 
+    class Config:
+        orm_mode = True
+
+class OrderHistoryOut(BaseModel):
+    id: int
+    user_id: int
+    total: float
+    cart: List[Any]
+    status: OrderStatus
+    created_at: datetime
+    archived: bool = False
+
+
     class Config:
         orm_mode = True
 
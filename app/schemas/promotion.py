@@ -0,0 +1,54 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+
+class PromotionKind(str, Enum):
+    PERCENT_OFF = "percent_off"
+    BUY_X_GET_Y = "buy_x_get_y"
+
+
+class PromotionBase(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    kind: PromotionKind
+    category: Optional[str] = Field(None, min_length=1, max_length=50)
+    product_id: Optional[int] = None
+    percent_off: Optional[float] = Field(None, gt=0, le=100)
+    buy_quantity: Optional[int] = Field(None, ge=1)
+    free_quantity: Optional[int] = Field(None, ge=1)
+    active: bool = True
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+
+
+class PromotionCreate(PromotionBase):
+
+    @model_validator(mode="after")
+    def check_rule(self):
+        if self.category is None and self.product_id is None:
+            raise ValueError("A promotion needs a category or a product_id")
+        if self.kind == PromotionKind.PERCENT_OFF and self.percent_off is None:
+            raise ValueError("percent_off promotions need percent_off")
+        if self.kind == PromotionKind.BUY_X_GET_Y and (self.buy_quantity is None or self.free_quantity is None):
+            raise ValueError("buy_x_get_y promotions need buy_quantity and free_quantity")
+        return self
+
+
+class PromotionUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    percent_off: Optional[float] = Field(None, gt=0, le=100)
+    buy_quantity: Optional[int] = Field(None, ge=1)
+    free_quantity: Optional[int] = Field(None, ge=1)
+    active: Optional[bool] = None
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+
+
+class PromotionOut(PromotionBase):
+    id: int
+
+
+    class Config:
+        orm_mode = True
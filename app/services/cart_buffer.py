@@ -0,0 +1,166 @@
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import case, update
+from sqlalchemy.orm import sessionmaker
+
+from app.core import database
+from app.core.config import from_settings, settings
+from app.core.outbox import record_event
+from app.core.sharding import ShardSet
+from app.models.cart import Cart
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): claim() cannot check for other workers
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+carts = Cart.__table__
+
+
+class CartWriteBuffer:
+    """
+    Write-behind buffer for cart line quantities.
+
+    ``stage`` records the latest quantity for a line in memory, so a burst
+    of +/- clicks on one line costs one row write when it is flushed.
+    ``flush`` writes every pending line with one UPDATE ... RETURNING per
+    shard, together with one ``cart.item_updated`` outbox event per line
+    the UPDATE matched, and runs every CART_WRITE_BEHIND_INTERVAL_MS; a
+    user's lines are also flushed before their cart is read, priced or
+    checked out.
+
+    Durability: a staged quantity is acknowledged before it is written, so
+    a crash loses at most one interval of quantity changes (shutdown
+    flushes). Pending writes live in this process only, so ``claim`` makes
+    the mode refuse to start in a second worker on the host.
+    """
+
+    def __init__(self, shards: ShardSet, catalog: sessionmaker, lock_path: str):
+        self.shards = shards
+        self.catalog = catalog
+        self.lock_path = lock_path
+        self._pending: Dict[int, Tuple[int, int, int]] = {}  # cart id -> (user_id, product_id, quantity)
+        self._by_user: Dict[int, Set[int]] = {}
+        self._lock = threading.Lock()
+        self._claim = None
+        self.stats = {"staged": 0, "flushed": 0, "flushes": 0, "dropped": 0}
+
+    def claim(self) -> None:
+        """
+        Take the write-behind flock for the life of this process, or raise
+        RuntimeError if another worker holds it: that worker's staged
+        quantities would be invisible here and flushed over newer writes.
+        """
+        if self._claim is not None:
+            return
+        if fcntl is None:
+            logger.warning("CART_WRITE_BEHIND cannot check for other workers without flock; run a single worker")
+            return
+        directory = os.path.dirname(self.lock_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.lock_path, "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(
+                f"CART_WRITE_BEHIND needs a single worker, but {self.lock_path} is held by another process"
+            ) from None
+        self._claim = lock_file
+
+    def get(self, cart_id: int) -> Optional[Tuple[int, int, int]]:
+        return self._pending.get(cart_id)
+
+    def has_pending(self, user_id: int) -> bool:
+        return user_id in self._by_user
+
+    def stage(self, cart_id: int, user_id: int, product_id: int, quantity: int) -> None:
+        with self._lock:
+            self._pending[cart_id] = (user_id, product_id, quantity)
+            self._by_user.setdefault(user_id, set()).add(cart_id)
+            self.stats["staged"] += 1
+
+    def discard(self, cart_id: int) -> None:
+        with self._lock:
+            self._take([cart_id])
+
+    def flush(self, user_id: Optional[int] = None) -> int:
+        """Write pending quantities, only ``user_id``'s if given. Returns the number of lines written."""
+        with self._lock:
+            cart_ids = list(self._pending) if user_id is None else list(self._by_user.get(user_id, ()))
+            batch = self._take(cart_ids)
+        if not batch:
+            return 0
+
+        by_shard: Dict[int, List[Tuple[int, int, Tuple[int, int, int]]]] = {}
+        for cart_id, line in batch.items():
+            shard, local_id = self.shards.locate(cart_id)
+            by_shard.setdefault(shard, []).append((cart_id, local_id, line))
+        flushed = 0
+        for shard, lines in by_shard.items():
+            source = self.shards.sessionmakers[shard] if self.shards.enabled else self.catalog
+            try:
+                with source() as db:
+                    # Core UPDATE on the table: the flush is last-writer-wins by design,
+                    # so it skips the ORM's version check (version still bumps). Lines
+                    # removed since they were staged match no row and get no event.
+                    quantities = {local_id: line[2] for _, local_id, line in lines}
+                    written = set(db.execute(
+                        update(carts)
+                        .where(carts.c.id.in_(list(quantities)))
+                        .values(quantity=case(quantities, value=carts.c.id))
+                        .returning(carts.c.id)
+                    ).scalars())
+                    for _, local_id, (line_user_id, product_id, quantity) in lines:
+                        if local_id not in written:
+                            continue
+                        record_event(db, "cart", line_user_id, "cart.item_updated", {
+                            "user_id": line_user_id,
+                            "product_id": product_id,
+                            "quantity": quantity,
+                        })
+                    db.commit()
+            except Exception:
+                self._restage(lines)
+                raise
+            flushed += len(written)
+            self.stats["dropped"] += len(lines) - len(written)
+        self.stats["flushed"] += flushed
+        self.stats["flushes"] += 1
+        return flushed
+
+    def _take(self, cart_ids: List[int]) -> Dict[int, Tuple[int, int, int]]:
+        taken = {}
+        for cart_id in cart_ids:
+            line = self._pending.pop(cart_id, None)
+            if line is None:
+                continue
+            taken[cart_id] = line
+            user_lines = self._by_user.get(line[0])
+            if user_lines is not None:
+                user_lines.discard(cart_id)
+                if not user_lines:
+                    del self._by_user[line[0]]
+        return taken
+
+    def _restage(self, lines) -> None:
+        # Lines staged again since the flush started are newer; keep those.
+        with self._lock:
+            for cart_id, _, line in lines:
+                if cart_id not in self._pending:
+                    self._pending[cart_id] = line
+                    self._by_user.setdefault(line[0], set()).add(cart_id)
+
+    def metrics(self) -> dict:
+        return {**self.stats, "pending": len(self._pending)}
+
+
+cart_buffer = from_settings(lambda: CartWriteBuffer(
+    database.cart_shards, database.SessionLocal, settings.CART_WRITE_BEHIND_LOCK_PATH
+))
@@ -0,0 +1,355 @@
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from app.core import database
+from app.core.config import from_settings, settings
+from app.models.outbox import OutboxEvent
+from app.models.product import Product
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): every worker keeps its own snapshot
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_ARRAYS = (
+    "ids", "price_cents", "stock", "versions", "updated", "category_codes",
+    "price_order", "sorted_prices", "category_order", "name_offsets", "names",
+)
+
+
+def snapshot_available() -> bool:
+    # numpy is imported where arrays are used, not with this module, so it stays off
+    # the startup path. Without it, catalog reads fall back to the database.
+    return importlib.util.find_spec("numpy") is not None
+
+
+def _open_array(path: str):
+    import numpy as np
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:  # zero-length arrays cannot be mapped
+        return np.load(path)
+
+
+class CatalogSnapshot:
+    """
+    Immutable columnar copy of ``products``, sorted by id.
+
+    Numbers live in NumPy arrays (prices in integer cents), categories are
+    small integer codes into an interned list and names are one UTF-8 blob
+    with offsets, so 100k products take roughly 7 MB and the whole snapshot
+    can be saved as plain ``.npy`` files and memory-mapped by other
+    processes. Per-category positions and a price ordering are built once
+    per snapshot, so category and price-range selections are a slice plus a
+    binary search.
+    """
+
+    def __init__(self, arrays: Dict[str, "np.ndarray"], categories: List[str], category_bounds: List[int],
+                 watermark: int, digest: str):
+        for field in _ARRAYS:
+            setattr(self, field, arrays[field])
+        self.categories = categories
+        self.category_bounds = category_bounds
+        self.watermark = watermark
+        self.digest = digest
+        self._category_codes = {name: code for code, name in enumerate(categories)}
+
+    @classmethod
+    def build(cls, ids, names: List[str], price_cents, stock, versions, updated, category_codes,
+              categories: List[str], watermark: int) -> "CatalogSnapshot":
+        import numpy as np
+        encoded = [name.encode("utf-8") for name in names]
+        name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+        price_order = np.argsort(price_cents, kind="stable")
+        category_order = np.argsort(category_codes, kind="stable")
+        per_category = np.bincount(category_codes, minlength=len(categories))
+        # Content-derived, so every worker holding the same data hands out the same ETags.
+        digest = hashlib.sha1(
+            repr((len(ids), int(ids.sum()), int(versions.sum()), int(updated.max(initial=0)))).encode()
+        ).hexdigest()[:16]
+        arrays = {
+            "ids": ids,
+            "price_cents": price_cents,
+            "stock": stock,
+            "versions": versions,
+            "updated": updated,
+            "category_codes": category_codes,
+            "price_order": price_order,
+            "sorted_prices": price_cents[price_order],
+            "category_order": category_order,
+            "name_offsets": name_offsets,
+            "names": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        }
+        bounds = [0] + np.cumsum(per_category).tolist()
+        return cls(arrays, list(categories), bounds, watermark, digest)
+
+    def save(self, path: str) -> None:
+        import numpy as np
+        os.makedirs(path)
+        for field in _ARRAYS:
+            np.save(os.path.join(path, f"{field}.npy"), getattr(self, field))
+        with open(os.path.join(path, "meta.json"), "w") as meta:
+            json.dump({
+                "categories": self.categories,
+                "category_bounds": self.category_bounds,
+                "watermark": self.watermark,
+                "digest": self.digest,
+            }, meta)
+
+    @classmethod
+    def open(cls, path: str) -> "CatalogSnapshot":
+        """Map a saved snapshot read-only; its pages are shared with every other process mapping it."""
+        with open(os.path.join(path, "meta.json")) as meta:
+            info = json.load(meta)
+        arrays = {field: _open_array(os.path.join(path, f"{field}.npy")) for field in _ARRAYS}
+        return cls(arrays, info["categories"], info["category_bounds"], info["watermark"], info["digest"])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def position(self, product_id: int) -> Optional[int]:
+        pos = int(self.ids.searchsorted(product_id))
+        return pos if pos < len(self.ids) and self.ids[pos] == product_id else None
+
+    def select(self, category: Optional[str] = None, min_price: Optional[float] = None,
+               max_price: Optional[float] = None):
+        """Positions matching the filters, in id order."""
+        import numpy as np
+        positions = None
+        if category is not None:
+            code = self._category_codes.get(category)
+            if code is None:
+                return np.zeros(0, dtype=np.int64)
+            positions = self.category_order[self.category_bounds[code]:self.category_bounds[code + 1]]
+        if min_price is not None or max_price is not None:
+            low = 0 if min_price is None else np.searchsorted(self.sorted_prices, round(min_price * 100), "left")
+            high = len(self) if max_price is None else np.searchsorted(self.sorted_prices, round(max_price * 100), "right")
+            in_range = np.sort(self.price_order[low:high])
+            positions = in_range if positions is None else np.intersect1d(positions, in_range, assume_unique=True)
+        return np.arange(len(self)) if positions is None else positions
+
+    def name(self, pos: int) -> str:
+        return bytes(self.names[self.name_offsets[pos]:self.name_offsets[pos + 1]]).decode("utf-8")
+
+    def rows(self, positions) -> List[dict]:
+        return [self.row(int(pos)) for pos in positions]
+
+    def row(self, pos: int) -> dict:
+        return {
+            "id": int(self.ids[pos]),
+            "name": self.name(pos),
+            "price": int(self.price_cents[pos]) / 100,
+            "stock": int(self.stock[pos]),
+            "category": self.categories[self.category_codes[pos]],
+        }
+
+    def version(self, pos: int) -> int:
+        return int(self.versions[pos])
+
+    def updated_at(self, pos: int) -> datetime:
+        return datetime.fromtimestamp(int(self.updated[pos]), tz=timezone.utc)
+
+    def listing_etag(self, *params) -> str:
+        digest = hashlib.sha1(repr((params, self.digest)).encode()).hexdigest()[:20]
+        return f'"products-{digest}"'
+
+
+def _epoch(value: datetime) -> int:
+    if value.tzinfo is None:  # SQLite hands back naive UTC timestamps
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+class CatalogSnapshotLoader:
+    """
+    Keeps ``current`` up to date. ``load`` reads the whole table once;
+    ``refresh`` then follows the outbox's product events past the last seen
+    event id and rebuilds the snapshot with only the touched rows re-read.
+    A full reload every ``full_reload_seconds`` also catches events whose
+    transaction committed after a later event id had already been read.
+
+    With a ``directory``, worker processes share one snapshot: whichever
+    worker takes the ``leader.lock`` flock does the loading and writes each
+    new snapshot to its own generation directory, then swaps the ``CURRENT``
+    pointer with an atomic rename. The other workers only read the pointer
+    and memory-map the generation it names. If the leader exits, its lock is
+    released and the next worker to refresh takes over.
+    """
+
+    def __init__(self, source: sessionmaker, full_reload_seconds: float, directory: Optional[str] = None):
+        self.source = source
+        self.full_reload_seconds = full_reload_seconds
+        self.directory = directory if fcntl is not None else None
+        self.current: Optional[CatalogSnapshot] = None
+        self.generation: Optional[str] = None
+        self.loaded_at: Optional[float] = None
+        self.refreshed_at: Optional[float] = None
+        self._leader_lock = None
+        self._lock = threading.Lock()
+
+    @property
+    def role(self) -> str:
+        if self.directory is None:
+            return "local"
+        return "leader" if self._leader_lock is not None else "follower"
+
+    def load(self) -> int:
+        if self.directory is not None and not self._lead():
+            return self._follow()
+        with self._lock, self.source() as db:
+            # The watermark is read first, so events racing the load are replayed, not lost.
+            watermark = db.query(func.coalesce(func.max(OutboxEvent.id), 0)).scalar()
+            rows = db.query(
+                Product.id, Product.name, Product.price, Product.stock,
+                Product.category, Product.version, Product.updated_at,
+            ).order_by(Product.id).all()
+            self._publish(self._build(rows, watermark))
+            self.loaded_at = self.refreshed_at = time.monotonic()
+        logger.info(f"Catalog snapshot loaded with {len(self.current)} products")
+        return len(self.current)
+
+    def refresh(self) -> int:
+        """Apply product changes recorded since the last refresh; returns how many products changed."""
+        if self.directory is not None and not self._lead():
+            return self._follow()
+        # loaded_at is unset until this process loads, including a follower that just took over.
+        if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.full_reload_seconds:
+            return self.load()
+        with self._lock, self.source() as db:
+            snapshot = self.current
+            events = (
+                db.query(OutboxEvent.id, OutboxEvent.aggregate_id)
+                .filter(OutboxEvent.id > snapshot.watermark, OutboxEvent.aggregate_type == "product")
+                .all()
+            )
+            self.refreshed_at = time.monotonic()
+            if not events:
+                return 0
+            changed = sorted({int(aggregate_id) for _, aggregate_id in events})
+            rows = db.query(
+                Product.id, Product.name, Product.price, Product.stock,
+                Product.category, Product.version, Product.updated_at,
+            ).filter(Product.id.in_(changed)).all()
+            self._publish(self._merge(snapshot, changed, rows, max(event_id for event_id, _ in events)))
+        return len(changed)
+
+    def _lead(self) -> bool:
+        """Hold the leader flock, taking it if it is free; the lock lives as long as the process."""
+        if self._leader_lock is not None:
+            return True
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(os.path.join(self.directory, "leader.lock"), "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._leader_lock = lock_file
+        logger.info(f"Catalog snapshot leader is pid {os.getpid()}")
+        return True
+
+    def _follow(self) -> int:
+        """Map the generation ``CURRENT`` names if it changed; returns its size, or 0 if unchanged."""
+        try:
+            with open(os.path.join(self.directory, "CURRENT")) as pointer:
+                generation = pointer.read().strip()
+            self.refreshed_at = time.monotonic()
+            if generation == self.generation:
+                return 0
+            snapshot = CatalogSnapshot.open(os.path.join(self.directory, generation))
+        except FileNotFoundError:
+            # Nothing published yet, or the generation was pruned between the two reads.
+            return 0
+        self.current, self.generation = snapshot, generation
+        return len(snapshot)
+
+    def _publish(self, snapshot: CatalogSnapshot) -> None:
+        if self.directory is None:
+            self.current = snapshot
+            return
+        generation = f"gen-{time.time_ns():x}"
+        snapshot.save(os.path.join(self.directory, generation))
+        pointer = os.path.join(self.directory, "CURRENT.tmp")
+        with open(pointer, "w") as tmp:
+            tmp.write(generation)
+        os.replace(pointer, os.path.join(self.directory, "CURRENT"))
+        previous, self.generation = self.generation, generation
+        self.current = CatalogSnapshot.open(os.path.join(self.directory, generation))
+        # Keep the previous generation for followers part-way through a swap. Removing
+        # older ones is safe even while mapped: the files live on until unmapped.
+        for name in os.listdir(self.directory):
+            if name.startswith("gen-") and name not in (generation, previous):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def _build(self, rows, watermark: int) -> CatalogSnapshot:
+        import numpy as np
+        codes: Dict[str, int] = {}
+        category_codes = np.fromiter(
+            (codes.setdefault(row.category, len(codes)) for row in rows), dtype=np.int16, count=len(rows)
+        )
+        return CatalogSnapshot.build(
+            ids=np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows)),
+            names=[row.name for row in rows],
+            price_cents=np.fromiter((int(Decimal(row.price) * 100) for row in rows), dtype=np.int64, count=len(rows)),
+            stock=np.fromiter((row.stock for row in rows), dtype=np.int32, count=len(rows)),
+            versions=np.fromiter((row.version for row in rows), dtype=np.int32, count=len(rows)),
+            updated=np.fromiter((_epoch(row.updated_at) for row in rows), dtype=np.int64, count=len(rows)),
+            category_codes=category_codes,
+            categories=list(codes),
+            watermark=watermark,
+        )
+
+    def _merge(self, snapshot: CatalogSnapshot, changed: List[int], rows, watermark: int) -> CatalogSnapshot:
+        import numpy as np
+        fresh = self._build(rows, watermark)
+        keep = np.flatnonzero(~np.isin(snapshot.ids, changed))
+        codes = {name: code for code, name in enumerate(snapshot.categories)}
+        remap = np.array([codes.setdefault(name, len(codes)) for name in fresh.categories], dtype=np.int16)
+
+        ids = np.concatenate([snapshot.ids[keep], fresh.ids])
+        order = np.argsort(ids, kind="stable")
+        names = [snapshot.name(pos) for pos in keep] + [fresh.name(pos) for pos in range(len(fresh))]
+        return CatalogSnapshot.build(
+            ids=ids[order],
+            names=[names[pos] for pos in order],
+            price_cents=np.concatenate([snapshot.price_cents[keep], fresh.price_cents])[order],
+            stock=np.concatenate([snapshot.stock[keep], fresh.stock])[order],
+            versions=np.concatenate([snapshot.versions[keep], fresh.versions])[order],
+            updated=np.concatenate([snapshot.updated[keep], fresh.updated])[order],
+            category_codes=np.concatenate([snapshot.category_codes[keep], remap[fresh.category_codes]])[order],
+            categories=list(codes),
+            watermark=watermark,
+        )
+
+    def metrics(self) -> dict:
+        snapshot = self.current
+        return {
+            "enabled": settings.CATALOG_SNAPSHOT,
+            "role": self.role,
+            "generation": self.generation,
+            "products": len(snapshot) if snapshot is not None else None,
+            "watermark": snapshot.watermark if snapshot is not None else None,
+            "seconds_since_refresh": time.monotonic() - self.refreshed_at if self.refreshed_at else None,
+        }
+
+
+catalog_snapshot = from_settings(lambda: CatalogSnapshotLoader(
+    database.SessionLocal,
+    settings.CATALOG_SNAPSHOT_FULL_RELOAD_SECONDS,
+    settings.CATALOG_SNAPSHOT_DIR,
+))
@@ -0,0 +1,215 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, delete, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.jobs import job_queue
+from app.core.outbox import record_event
+from app.core.sharding import ShardSessions
+from app.models.cart import Cart
+from app.models.order import Order, OrderArchive, Payment
+from app.models.product import Product
+from app.schemas.order import OrderStatus, PaymentStatus
+
+logger = logging.getLogger(__name__)
+
+# Checkout is three short transactions: reserve (the order is written as
+# PENDING_PAYMENT and its stock taken), pay (no transaction open while the
+# provider is called), then confirm or release. Confirm and release are
+# guarded on the order still being PENDING_PAYMENT, so the request path and
+# the reconciler can race on the same order and only one of them wins. The
+# request path stamps ``payment_started_at`` before it charges, and the
+# reconciler never releases an order whose latest attempt may be in flight.
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id: int):
+        super().__init__(f"Insufficient stock for product {product_id}")
+        self.product_id = product_id
+
+
+def payment_key(order_id: int) -> str:
+    """Idempotency key for an order's charge; also how the reconciler finds it again."""
+    return f"order-{order_id}"
+
+
+def take_stock(db: Session, quantities: Dict[int, int]) -> list:
+    """
+    Decrement stock for every product in ``quantities``; raises
+    InsufficientStock (after rolling back) if any product is short.
+
+    Each decrement is a single guarded UPDATE, so concurrent checkouts cannot
+    oversell; products are taken in id order to keep lock order consistent.
+    """
+    taken = []
+    for product_id in sorted(quantities):
+        row = db.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.stock >= quantities[product_id])
+            .values(stock=Product.stock - quantities[product_id], version=Product.version + 1)
+            .returning(Product.id, Product.name, Product.category, Product.stock)
+        ).first()
+        if row is None:
+            db.rollback()
+            raise InsufficientStock(product_id)
+        record_event(db, "product", product_id, "product.stock_changed", {"id": product_id, "stock": row.stock})
+        taken.append(row)
+    return taken
+
+
+def return_stock(db: Session, quantities: Dict[int, int]) -> list:
+    """Put stock taken by a released order back. Products deleted since are skipped."""
+    returned = []
+    for product_id in sorted(quantities):
+        row = db.execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .values(stock=Product.stock + quantities[product_id], version=Product.version + 1)
+            .returning(Product.id, Product.name, Product.category, Product.stock)
+        ).first()
+        if row is not None:
+            record_event(db, "product", product_id, "product.stock_changed", {"id": product_id, "stock": row.stock})
+            returned.append(row)
+    return returned
+
+
+def order_quantities(lines: List[dict]) -> Dict[int, int]:
+    quantities: Dict[int, int] = {}
+    for line in lines:
+        quantities[line["product_id"]] = quantities.get(line["product_id"], 0) + line["quantity"]
+    return quantities
+
+
+def start_payment(db: Session, order_id: int) -> bool:
+    """Record that a charge for a reserved order is about to be made. The caller commits; False means it was settled."""
+    return db.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.status == OrderStatus.PENDING_PAYMENT.value)
+        .values(payment_started_at=datetime.now(timezone.utc))
+        .returning(Order.id)
+    ).first() is not None
+
+
+def _settle(db: Session, order_id: int, status: OrderStatus, attempt_cutoff: Optional[datetime] = None) -> Optional[Order]:
+    """
+    Move a PENDING_PAYMENT order to ``status``; None if it was already
+    settled, or if a payment attempt started at or after ``attempt_cutoff``.
+    """
+    condition = [Order.id == order_id, Order.status == OrderStatus.PENDING_PAYMENT.value]
+    if attempt_cutoff is not None:
+        condition.append(or_(Order.payment_started_at.is_(None), Order.payment_started_at < attempt_cutoff))
+    values = {"status": status.value}
+    if status is OrderStatus.COMPLETED:
+        values["completed_at"] = datetime.now(timezone.utc)
+    return db.execute(
+        update(Order)
+        .where(*condition)
+        .values(**values)
+        .returning(Order.id, Order.user_id, Order.total, Order.cart)
+    ).first()
+
+
+def confirm_order(db: Session, order_id: int, charge: dict) -> Optional[Order]:
+    """Mark a reserved order paid. The caller commits; returns the order row, or None if it was already settled."""
+    order = _settle(db, order_id, OrderStatus.COMPLETED)
+    if order is None:
+        return None
+    db.add(Payment(
+        order_id=order_id,
+        amount=order.total,
+        provider=settings.PAYMENT_PROVIDER_NAME,
+        status=PaymentStatus.SUCCESS.value,
+        transaction_id=charge["id"],
+    ))
+    record_event(db, "order", order_id, "order.paid", {
+        "order_id": order_id,
+        "user_id": order.user_id,
+        "total": order.total,
+        "transaction_id": charge["id"],
+    })
+    return order
+
+
+def complete_payment(shards: ShardSessions, order_id: int, charge: dict) -> bool:
+    """
+    Confirm a charged order, clear its lines from the owner's cart and
+    queue ``payment.processed``: everything a successful payment implies,
+    whether /pay or the reconciler saw the charge. The caller commits
+    ``shards``; False means the order was already settled.
+    """
+    order = confirm_order(shards.catalog, order_id, charge)
+    if order is None:
+        return False
+    db = shards.for_user(order.user_id)
+    # Only lines still as they were ordered are cleared: one changed while the
+    # charge was in flight was not paid for, so it stays in the cart.
+    ordered = or_(*(
+        and_(Cart.product_id == line["product_id"], Cart.quantity == line["quantity"]) for line in order.cart
+    ))
+    cleared = db.execute(
+        delete(Cart).where(Cart.user_id == order.user_id, ordered).returning(Cart.product_id, Cart.quantity)
+    ).all()
+    record_event(db, "cart", order.user_id, "cart.checked_out", {
+        "user_id": order.user_id,
+        "order_id": order_id,
+        "items": [{"product_id": item.product_id, "quantity": item.quantity} for item in cleared],
+    })
+    job_queue.enqueue(shards.catalog, "payment.processed", {
+        "user_id": order.user_id,
+        "order_id": order_id,
+        "transaction_id": charge["id"],
+    })
+    return True
+
+
+def release_order(db: Session, order_id: int, reason: str, attempt_cutoff: Optional[datetime] = None) -> Optional[list]:
+    """
+    Fail a reserved order and return its stock. The caller commits; returns
+    the restocked product rows, or None if the order was already settled.
+    With ``attempt_cutoff``, an order whose payment attempt started at or
+    after it is treated as being charged right now and is left alone.
+    """
+    order = _settle(db, order_id, OrderStatus.FAILED, attempt_cutoff)
+    if order is None:
+        return None
+    db.add(Payment(
+        order_id=order_id,
+        amount=order.total,
+        provider=settings.PAYMENT_PROVIDER_NAME,
+        status=PaymentStatus.FAILED.value,
+    ))
+    record_event(db, "order", order_id, "order.payment_failed", {
+        "order_id": order_id,
+        "user_id": order.user_id,
+        "reason": reason,
+    })
+    return return_stock(db, order_quantities(order.cart))
+
+
+def completed_orders(db: Session, columns: Sequence[str], after: Optional[Tuple[datetime, int]], limit: int) -> list:
+    """
+    Up to ``limit`` COMPLETED orders from ``orders`` and ``orders_archive``
+    in settlement order, past the ``(completed_at, id)`` cursor ``after``.
+    Rows carry ``id``, ``completed_at`` and ``columns``. Orders settled in
+    the last ORDER_SETTLE_GRACE_SECONDS are left for a later call, so a
+    settlement that commits late does not land behind an advanced cursor.
+    """
+    settled_before = datetime.now(timezone.utc) - timedelta(seconds=settings.ORDER_SETTLE_GRACE_SECONDS)
+    rows = []
+    for model in (Order, OrderArchive):
+        query = db.query(*(getattr(model, name) for name in ("id", "completed_at", *columns))).filter(
+            model.status == OrderStatus.COMPLETED.value,
+            model.completed_at < settled_before,
+        )
+        if after is not None:
+            completed_at, order_id = after
+            query = query.filter(or_(
+                model.completed_at > completed_at,
+                and_(model.completed_at == completed_at, model.id > order_id),
+            ))
+        rows.extend(query.order_by(model.completed_at, model.id).limit(limit).all())
+    rows.sort(key=lambda row: (row.completed_at, row.id))
+    return rows[:limit]
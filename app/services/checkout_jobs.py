@@ -0,0 +1,18 @@
+import logging
+
+from app.core.jobs import job_handler
+
+logger = logging.getLogger(__name__)
+
+
+# Post-checkout work runs here, off the request path. Receipts, stock sync,
+# analytics and webhooks hang off these two events.
+
+@job_handler("order.created")
+def send_order_receipt(payload: dict) -> None:
+    logger.info(f"Receipt for order {payload['order_id']} (user {payload['user_id']}, total {payload['total']})")
+
+
+@job_handler("payment.processed")
+def record_payment(payload: dict) -> None:
+    logger.info(f"Payment processed for user {payload['user_id']}")
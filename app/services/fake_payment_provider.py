@@ -0,0 +1,63 @@
+import asyncio
+import uuid
+from decimal import Decimal
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Header, HTTPException, status
+
+# A stand-in payment provider for local runs and tests. Run it with
+#   uvicorn app.services.fake_payment_provider:app --port 8001
+# or mount it in process with httpx.ASGITransport(app=app).
+#
+# Charges succeed unless the amount ends in .13 (declined with 402). Set
+# ``failures_remaining`` to answer that many requests with 503 and
+# ``latency_seconds`` to slow every charge down. A repeated Idempotency-Key
+# returns the original charge, and GET /v1/charges?idempotency_key= looks it up.
+
+app = FastAPI(title="Fake payment provider")
+
+charges: Dict[str, dict] = {}
+failures_remaining = 0
+latency_seconds = 0.0
+
+
+def _authorize(authorization: Optional[str]) -> None:
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing API key")
+
+
+@app.get("/v1/charges")
+async def find_charge(idempotency_key: str, authorization: Optional[str] = Header(None)):
+    _authorize(authorization)
+    if idempotency_key not in charges:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No such charge")
+    return charges[idempotency_key]
+
+
+@app.post("/v1/charges")
+async def create_charge(
+    charge: dict,
+    authorization: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+):
+    global failures_remaining
+    _authorize(authorization)
+    if idempotency_key in charges:
+        return charges[idempotency_key]
+    if latency_seconds:
+        await asyncio.sleep(latency_seconds)
+    if failures_remaining > 0:
+        failures_remaining -= 1
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Provider unavailable")
+    amount = Decimal(charge["amount"])
+    if amount % 1 == Decimal("0.13"):
+        raise HTTPException(status_code=status.HTTP_402_PAYMENT_REQUIRED, detail="Card declined")
+    created = {
+        "id": f"ch_{uuid.uuid4().hex[:24]}",
+        "status": "succeeded",
+        "amount": charge["amount"],
+        "currency": charge.get("currency", "USD"),
+    }
+    if idempotency_key:
+        charges[idempotency_key] = created
+    return created
@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core import database
+from app.core.config import from_settings, settings
+from app.models.product import Product
+
+logger = logging.getLogger(__name__)
+
+
+class LowStockTracker:
+    """
+    The set of products at or below their category's reorder threshold.
+
+    Stock writers call ``observe`` after committing, so the set is current
+    for changes made by this process; ``refresh`` rebuilds it from the
+    ``(category, stock)`` index to pick up changes made elsewhere. Products
+    that newly cross the threshold here are queued as alerts, and ``flush``
+    hands them to the registered listeners in one batch.
+    """
+
+    def __init__(self, source: sessionmaker, thresholds: Dict[str, int], default_threshold: int,
+                 listeners: Optional[List[Callable[[List[dict]], None]]] = None):
+        self.source = source
+        self.thresholds = thresholds
+        self.default_threshold = default_threshold
+        self._items: Dict[int, dict] = {}
+        self._alerts: Dict[int, dict] = {}
+        self._listeners = listeners if listeners is not None else []
+        self._lock = threading.Lock()
+        self.last_refresh_at: Optional[float] = None
+
+    def threshold(self, category: str) -> int:
+        return self.thresholds.get(category, self.default_threshold)
+
+    def listener(self, fn: Callable[[List[dict]], None]) -> Callable[[List[dict]], None]:
+        self._listeners.append(fn)
+        return fn
+
+    def observe(self, product_id: int, name: str, category: str, stock: int) -> None:
+        threshold = self.threshold(category)
+        with self._lock:
+            if stock > threshold:
+                self._items.pop(product_id, None)
+                self._alerts.pop(product_id, None)
+                return
+            item = {"product_id": product_id, "name": name, "category": category, "stock": stock, "threshold": threshold}
+            if product_id not in self._items:
+                self._alerts[product_id] = item
+            elif product_id in self._alerts:
+                self._alerts[product_id] = item
+            self._items[product_id] = item
+
+    def discard(self, product_id: int) -> None:
+        with self._lock:
+            self._items.pop(product_id, None)
+            self._alerts.pop(product_id, None)
+
+    def items(self, category: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            items = [item for item in self._items.values() if category is None or item["category"] == category]
+        return sorted(items, key=lambda item: (item["stock"], item["product_id"]))
+
+    def refresh(self) -> int:
+        """Rebuild the set with one index range scan per category. Does not raise alerts."""
+        items = {}
+        with self.source() as db:
+            categories = [category for category, in db.query(Product.category).distinct()]
+            for category in categories:
+                threshold = self.threshold(category)
+                rows = (
+                    db.query(Product.id, Product.name, Product.stock)
+                    .filter(Product.category == category, Product.stock <= threshold)
+                    .all()
+                )
+                for product_id, name, stock in rows:
+                    items[product_id] = {
+                        "product_id": product_id,
+                        "name": name,
+                        "category": category,
+                        "stock": stock,
+                        "threshold": threshold,
+                    }
+        with self._lock:
+            self._items = items
+        self.last_refresh_at = time.time()
+        return len(items)
+
+    def flush(self) -> int:
+        with self._lock:
+            alerts, self._alerts = list(self._alerts.values()), {}
+        if not alerts:
+            return 0
+        for fn in self._listeners:
+            try:
+                fn(alerts)
+            except Exception:
+                logger.exception(f"Low-stock listener {fn.__qualname__} failed")
+        return len(alerts)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "low_stock": len(self._items),
+                "pending_alerts": len(self._alerts),
+                "last_refresh_at": self.last_refresh_at,
+            }
+
+
+# Listeners register at import, so they outlive a tracker rebuilt for new settings.
+_listeners: List[Callable[[List[dict]], None]] = []
+
+low_stock = from_settings(lambda: LowStockTracker(
+    database.SessionLocal,
+    settings.LOW_STOCK_THRESHOLDS,
+    settings.LOW_STOCK_DEFAULT_THRESHOLD,
+    listeners=_listeners,
+))
+
+
+def low_stock_listener(fn: Callable[[List[dict]], None]) -> Callable[[List[dict]], None]:
+    """Register the decorated function for low-stock alert batches without building the tracker."""
+    _listeners.append(fn)
+    return fn
+
+
+# Reorder e-mails, purchasing webhooks and the like hang off here.
+
+@low_stock_listener
+def log_low_stock(alerts: List[dict]) -> None:
+    summary = ", ".join(f"{alert['name']} ({alert['stock']}/{alert['threshold']})" for alert in alerts)
+    logger.warning(f"{len(alerts)} products fell to their reorder threshold: {summary}")
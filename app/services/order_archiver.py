@@ -0,0 +1,81 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core import database
+from app.core.config import from_settings, settings
+from app.models.order import Order, OrderArchive
+from app.schemas.order import OrderStatus
+
+logger = logging.getLogger(__name__)
+
+
+class OrderArchiver:
+    """
+    Moves orders older than ``retention_days`` from ``orders`` into
+    ``orders_archive``, oldest first, ``batch_size`` rows per transaction.
+    The hot table then only holds the retention window, so recent-order
+    reads and vacuum stay proportional to current volume rather than to
+    all history. Orders still awaiting payment are left for the reconciler.
+    """
+
+    def __init__(self, source: sessionmaker, retention_days: float, batch_size: int, max_batches: int):
+        self.source = source
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.total_archived = 0
+        self.last_run_archived = 0
+        self.last_run_seconds = 0.0
+        self.last_run_at: Optional[float] = None
+
+    def archive_once(self) -> int:
+        started = time.perf_counter()
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+        archived = 0
+        for _ in range(self.max_batches):
+            with self.source() as db:
+                rows = (
+                    db.query(Order.id, Order.user_id, Order.cart, Order.total, Order.status, Order.created_at,
+                             Order.completed_at)
+                    .filter(Order.created_at < cutoff, Order.status != OrderStatus.PENDING_PAYMENT.value)
+                    .order_by(Order.id)
+                    .limit(self.batch_size)
+                    .all()
+                )
+                if not rows:
+                    break
+                db.execute(insert(OrderArchive), [row._asdict() for row in rows])
+                db.query(Order).filter(Order.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+                db.commit()
+            archived += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        self.total_archived += archived
+        self.last_run_archived = archived
+        self.last_run_seconds = time.perf_counter() - started
+        self.last_run_at = time.time()
+        if archived:
+            logger.info(f"Archived {archived} orders older than {self.retention_days} days in {self.last_run_seconds:.2f}s")
+        return archived
+
+    def metrics(self) -> dict:
+        return {
+            "retention_days": self.retention_days,
+            "total_archived": self.total_archived,
+            "last_run_archived": self.last_run_archived,
+            "last_run_seconds": self.last_run_seconds,
+            "last_run_at": self.last_run_at,
+        }
+
+
+order_archiver = from_settings(lambda: OrderArchiver(
+    database.SessionLocal,
+    settings.ORDER_RETENTION_DAYS,
+    settings.ORDER_ARCHIVE_BATCH_SIZE,
+    settings.ORDER_ARCHIVE_MAX_BATCHES,
+))
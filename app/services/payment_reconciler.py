@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from app.core import database
+from app.core.config import from_settings, settings
+from app.core.sharding import ShardSessions, ShardSet
+from app.models.order import Order
+from app.schemas.order import OrderStatus
+from app.services.checkout import complete_payment, payment_key, release_order
+from app.services.inventory import low_stock
+from app.services.payments import PaymentError, PaymentGateway, payment_gateway
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentReconciler:
+    """
+    Settles orders left in PENDING_PAYMENT for longer than
+    ``pending_seconds``, e.g. when the client went away mid-checkout or the
+    provider timed out. Each stuck order's charge is looked up by its
+    idempotency key: a successful charge confirms the order, no charge
+    releases it and returns its stock, and a failed lookup leaves it for the
+    next run. A confirmed order gets the same follow-up as one paid through
+    /pay: its lines leave the owner's cart shard and ``payment.processed``
+    is queued. Orders whose latest payment attempt started less than
+    ``attempt_seconds`` ago may be being charged right now and are skipped,
+    both when they are read and again in the releasing UPDATE. Orders are
+    read ``batch_size`` at a time along the (status, created_at) index,
+    lookups run concurrently within the gateway's limits, and each batch is
+    settled in one short transaction per database.
+    """
+
+    def __init__(
+        self,
+        source: sessionmaker,
+        shards: ShardSet,
+        gateway: PaymentGateway,
+        pending_seconds: float,
+        attempt_seconds: float,
+        batch_size: int,
+        max_batches: int,
+    ):
+        self.source = source
+        self.shards = shards
+        self.gateway = gateway
+        self.pending_seconds = pending_seconds
+        self.attempt_seconds = attempt_seconds
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.total_confirmed = 0
+        self.total_released = 0
+        self.last_run_unresolved = 0
+        self.last_run_at: Optional[float] = None
+
+    async def reconcile_once(self) -> int:
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(seconds=self.pending_seconds)
+        attempt_cutoff = now - timedelta(seconds=self.attempt_seconds)
+        cursor = 0
+        settled = unresolved = 0
+        for _ in range(self.max_batches):
+            order_ids = await run_in_threadpool(self._stuck_orders, cutoff, attempt_cutoff, cursor)
+            if not order_ids:
+                break
+            cursor = order_ids[-1]
+            lookups = await asyncio.gather(
+                *(self.gateway.find_charge(payment_key(order_id)) for order_id in order_ids),
+                return_exceptions=True,
+            )
+            unresolved += sum(isinstance(lookup, BaseException) for lookup in lookups)
+            settled += await run_in_threadpool(self._settle, order_ids, lookups, attempt_cutoff)
+            if len(order_ids) < self.batch_size:
+                break
+        self.last_run_unresolved = unresolved
+        self.last_run_at = time.time()
+        if settled or unresolved:
+            logger.info(f"Reconciled {settled} stuck orders; {unresolved} left pending after failed lookups")
+        return settled
+
+    def _stuck_orders(self, cutoff: datetime, attempt_cutoff: datetime, cursor: int) -> List[int]:
+        with self.source() as db:
+            return [
+                order_id for order_id, in db.query(Order.id)
+                .filter(
+                    Order.status == OrderStatus.PENDING_PAYMENT.value,
+                    Order.created_at < cutoff,
+                    or_(Order.payment_started_at.is_(None), Order.payment_started_at < attempt_cutoff),
+                    Order.id > cursor,
+                )
+                .order_by(Order.id)
+                .limit(self.batch_size)
+            ]
+
+    def _settle(self, order_ids: List[int], lookups: list, attempt_cutoff: datetime) -> int:
+        confirmed = released = 0
+        restocked = []
+        with self.source() as db:
+            shards = ShardSessions(self.shards, db)
+            for order_id, charge in zip(order_ids, lookups):
+                if isinstance(charge, PaymentError):
+                    continue
+                if isinstance(charge, BaseException):
+                    logger.error(f"Charge lookup for order {order_id} failed", exc_info=charge)
+                elif charge is not None:
+                    confirmed += complete_payment(shards, order_id, charge)
+                else:
+                    # A /pay that started after the lookup has stamped the order; leave it alone.
+                    returned = release_order(db, order_id, "payment not completed in time", attempt_cutoff)
+                    if returned is not None:
+                        released += 1
+                        restocked.extend(returned)
+            try:
+                shards.commit()
+            finally:
+                shards.close()
+        for product_id, name, category, remaining in restocked:
+            low_stock.observe(product_id, name, category, remaining)
+        self.total_confirmed += confirmed
+        self.total_released += released
+        return confirmed + released
+
+    def metrics(self) -> dict:
+        return {
+            "pending_seconds": self.pending_seconds,
+            "attempt_seconds": self.attempt_seconds,
+            "total_confirmed": self.total_confirmed,
+            "total_released": self.total_released,
+            "last_run_unresolved": self.last_run_unresolved,
+            "last_run_at": self.last_run_at,
+        }
+
+
+payment_reconciler = from_settings(lambda: PaymentReconciler(
+    database.SessionLocal,
+    database.cart_shards,
+    payment_gateway,
+    settings.PAYMENT_PENDING_SECONDS,
+    settings.PAYMENT_ATTEMPT_SECONDS,
+    settings.PAYMENT_RECONCILE_BATCH_SIZE,
+    settings.PAYMENT_RECONCILE_MAX_BATCHES,
+))
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import time
+from decimal import Decimal
+from typing import Optional
+
+import httpx
+
+from app.core.config import from_settings, settings
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentError(Exception):
+    """Base class for payment failures."""
+
+
+class PaymentDeclined(PaymentError):
+    """The provider refused the charge; retrying will not help."""
+
+
+class PaymentUnavailable(PaymentError):
+    """The provider could not be reached or failed; the charge may be retried."""
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive failures and rejects calls for
+    ``reset_seconds``; after that a single trial call decides whether it
+    closes again or stays open for another period.
+    """
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self._trial = False
+
+
+class PaymentGateway:
+    """
+    Async client for the payment provider.
+
+    One ``httpx.AsyncClient`` is shared by every request, so connections are
+    pooled and kept alive. Calls are bounded by ``max_concurrency`` and by
+    explicit timeouts, and a circuit breaker fails fast while the provider
+    is down. Callers must not hold a database transaction across ``charge``.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        timeout: float,
+        connect_timeout: float,
+        max_connections: int,
+        max_concurrency: int,
+        breaker: CircuitBreaker,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.transport = transport
+        self.breaker = breaker
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+        self.stats = {"succeeded": 0, "declined": 0, "failed": 0, "rejected": 0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self.transport,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        if not self.breaker.allow():
+            self.stats["rejected"] += 1
+            raise PaymentUnavailable("Payment provider circuit is open")
+        async with self._slots:
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.HTTPError as exc:
+                self.breaker.record_failure()
+                self.stats["failed"] += 1
+                raise PaymentUnavailable(f"Payment provider unreachable: {exc!r}") from exc
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            self.stats["failed"] += 1
+            raise PaymentUnavailable(f"Payment provider error {response.status_code}")
+        self.breaker.record_success()
+        return response
+
+    async def charge(self, user_id: int, amount: Decimal, currency: str, idempotency_key: str) -> dict:
+        """Charge ``amount``; returns the provider's charge object."""
+        response = await self._request(
+            "POST",
+            "/v1/charges",
+            json={"user_id": user_id, "amount": str(amount), "currency": currency},
+            headers={"Idempotency-Key": idempotency_key},
+        )
+        if response.status_code == 402:
+            self.stats["declined"] += 1
+            raise PaymentDeclined(response.json().get("detail", "Payment declined"))
+        if response.status_code >= 400:
+            self.stats["failed"] += 1
+            raise PaymentError(f"Payment rejected by provider ({response.status_code}): {response.text}")
+        self.stats["succeeded"] += 1
+        return response.json()
+
+    async def find_charge(self, idempotency_key: str) -> Optional[dict]:
+        """The successful charge made under ``idempotency_key``, or None if there is none."""
+        response = await self._request("GET", "/v1/charges", params={"idempotency_key": idempotency_key})
+        if response.status_code == 404:
+            return None
+        if response.status_code >= 400:
+            raise PaymentError(f"Charge lookup rejected by provider ({response.status_code}): {response.text}")
+        return response.json()
+
+    def metrics(self) -> dict:
+        return {
+            **self.stats,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+        }
+
+
+payment_gateway = from_settings(lambda: PaymentGateway(
+    settings.PAYMENT_PROVIDER_URL,
+    settings.PAYMENT_PROVIDER_KEY,
+    timeout=settings.PAYMENT_TIMEOUT_SECONDS,
+    connect_timeout=settings.PAYMENT_CONNECT_TIMEOUT_SECONDS,
+    max_connections=settings.PAYMENT_MAX_CONNECTIONS,
+    max_concurrency=settings.PAYMENT_MAX_CONCURRENCY,
+    breaker=CircuitBreaker(settings.PAYMENT_BREAKER_THRESHOLD, settings.PAYMENT_BREAKER_RESET_SECONDS),
+))
@@ -0,0 +1,115 @@
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from app.core.config import from_settings, settings
+from app.services.promotions import PromotionIndex
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0")
+
+
+def to_money(value) -> Decimal:
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class PriceRules:
+    """
+    Category discounts and tax rates compiled into a single lookup table, so
+    pricing a line is one dict access instead of a walk over the rules.
+    """
+
+    def __init__(
+        self,
+        category_discounts: Mapping[str, float],
+        category_tax_rates: Mapping[str, float],
+        default_tax_rate: float,
+    ):
+        default = (ZERO, Decimal(str(default_tax_rate)))
+        categories = set(category_discounts) | set(category_tax_rates)
+        self.default = default
+        self.table: Dict[str, Tuple[Decimal, Decimal]] = {
+            category: (
+                Decimal(str(category_discounts.get(category, 0))),
+                Decimal(str(category_tax_rates.get(category, default_tax_rate))),
+            )
+            for category in categories
+        }
+
+    def rates(self, category: str) -> Tuple[Decimal, Decimal]:
+        """Return ``(discount_rate, tax_rate)`` for a category."""
+        return self.table.get(category, self.default)
+
+
+class PricedLine:
+    __slots__ = (
+        "product_id", "product_name", "category", "quantity", "unit_price",
+        "line_subtotal", "discount", "tax", "line_total", "promotion",
+    )
+
+    def __init__(self, product_id, product_name, category, quantity, unit_price, line_subtotal, discount, tax,
+                 promotion=None):
+        self.promotion = promotion
+        self.product_id = product_id
+        self.product_name = product_name
+        self.category = category
+        self.quantity = quantity
+        self.unit_price = unit_price
+        self.line_subtotal = line_subtotal
+        self.discount = discount
+        self.tax = tax
+        self.line_total = line_subtotal - discount + tax
+
+    def dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class CartTotals:
+    def __init__(self, lines: List[PricedLine]):
+        self.lines = lines
+        self.item_count = sum(line.quantity for line in lines)
+        self.subtotal = sum((line.line_subtotal for line in lines), ZERO)
+        self.discount = sum((line.discount for line in lines), ZERO)
+        self.tax = sum((line.tax for line in lines), ZERO)
+        self.total = self.subtotal - self.discount + self.tax
+
+
+def price_cart(
+    rows: Iterable[Tuple[int, str, str, object, int]],
+    rules: Optional[PriceRules] = None,
+    promotions: Optional[PromotionIndex] = None,
+) -> CartTotals:
+    """
+    Price ``(product_id, product_name, category, unit_price, quantity)`` rows
+    in a single pass. Discounts and taxes are rounded per line, so the order
+    total always equals the sum of its lines.
+
+    Discounts do not stack: a line gets the larger of its category discount
+    and the best matching promotion.
+    """
+    rules = rules or price_rules
+    now = datetime.now(timezone.utc)
+    lines = []
+    for product_id, product_name, category, unit_price, quantity in rows:
+        unit_price = to_money(unit_price)
+        discount_rate, tax_rate = rules.rates(category)
+        line_subtotal = unit_price * quantity
+        discount = to_money(line_subtotal * discount_rate)
+        promotion_name = None
+        if promotions is not None:
+            promotion_discount, promotion = promotions.best(product_id, category, unit_price, quantity, now)
+            if promotion_discount > discount:
+                discount = min(to_money(promotion_discount), line_subtotal)
+                promotion_name = promotion.name
+        tax = to_money((line_subtotal - discount) * tax_rate)
+        lines.append(PricedLine(
+            product_id, product_name, category, quantity, unit_price, line_subtotal, discount, tax, promotion_name
+        ))
+    return CartTotals(lines)
+
+
+price_rules = from_settings(lambda: PriceRules(
+    settings.CATEGORY_DISCOUNTS,
+    settings.CATEGORY_TAX_RATES,
+    settings.DEFAULT_TAX_RATE,
+))
@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import from_settings, settings
+from app.models.promotion import Promotion
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0")
+CENT = Decimal("0.01")
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class CompiledPromotion:
+    """A promotion row reduced to what line pricing needs."""
+
+    __slots__ = ("id", "name", "kind", "rate", "buy", "free", "starts_at", "ends_at")
+
+    def __init__(self, promotion):
+        self.id = promotion.id
+        self.name = promotion.name
+        self.kind = promotion.kind
+        self.rate = Decimal(str(promotion.percent_off or 0)) / 100
+        self.buy = promotion.buy_quantity or 0
+        self.free = promotion.free_quantity or 0
+        self.starts_at = _utc(promotion.starts_at)
+        self.ends_at = _utc(promotion.ends_at)
+
+    def live(self, now: datetime) -> bool:
+        return (self.starts_at is None or self.starts_at <= now) and (self.ends_at is None or now < self.ends_at)
+
+    def discount(self, unit_price: Decimal, quantity: int) -> Decimal:
+        if self.kind == "buy_x_get_y":
+            free_units = quantity // (self.buy + self.free) * self.free
+            return unit_price * free_units
+        return (unit_price * quantity * self.rate).quantize(CENT)
+
+
+class PromotionIndex:
+    """
+    Active promotions indexed by product id and by category, so a cart line
+    only looks at the handful of rules that can apply to it.
+
+    Within a bucket, open-ended rules that another open-ended rule always
+    beats are dropped at compile time: only the highest percent-off survives,
+    and buy-X-get-Y rules are kept once per (buy, free) pair.
+    """
+
+    def __init__(self, promotions: Iterable = ()):
+        by_product: Dict[int, List[CompiledPromotion]] = defaultdict(list)
+        by_category: Dict[str, List[CompiledPromotion]] = defaultdict(list)
+        self.size = 0
+        for promotion in promotions:
+            compiled = CompiledPromotion(promotion)
+            if promotion.product_id is not None:
+                by_product[promotion.product_id].append(compiled)
+            else:
+                by_category[promotion.category].append(compiled)
+            self.size += 1
+        self.by_product = {key: self._prune(rules) for key, rules in by_product.items()}
+        self.by_category = {key: self._prune(rules) for key, rules in by_category.items()}
+
+    @staticmethod
+    def _prune(rules: List[CompiledPromotion]) -> List[CompiledPromotion]:
+        kept: List[CompiledPromotion] = []
+        best_percent: Optional[CompiledPromotion] = None
+        seen_bundles = set()
+        for rule in rules:
+            if rule.starts_at is not None or rule.ends_at is not None:
+                kept.append(rule)
+            elif rule.kind == "buy_x_get_y":
+                if (rule.buy, rule.free) not in seen_bundles:
+                    seen_bundles.add((rule.buy, rule.free))
+                    kept.append(rule)
+            elif best_percent is None or rule.rate > best_percent.rate:
+                best_percent = rule
+        if best_percent is not None:
+            kept.append(best_percent)
+        return kept
+
+    def best(
+        self,
+        product_id: int,
+        category: str,
+        unit_price: Decimal,
+        quantity: int,
+        now: Optional[datetime] = None,
+    ) -> Tuple[Decimal, Optional[CompiledPromotion]]:
+        """Return the largest discount any live promotion gives this line, and that promotion."""
+        best_discount, best_promotion = ZERO, None
+        candidates = self.by_product.get(product_id, []) + self.by_category.get(category, [])
+        if not candidates:
+            return best_discount, best_promotion
+        now = now or datetime.now(timezone.utc)
+        for promotion in candidates:
+            if not promotion.live(now):
+                continue
+            discount = promotion.discount(unit_price, quantity)
+            if discount > best_discount:
+                best_discount, best_promotion = discount, promotion
+        return best_discount, best_promotion
+
+
+class PromotionCache:
+    """
+    Holds the compiled PromotionIndex. Promotion writes in this process call
+    ``invalidate``; other workers pick changes up when ``ttl`` expires.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._index: Optional[PromotionIndex] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._index = None
+
+    def get(self, db: Session) -> PromotionIndex:
+        index = self._index
+        if index is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return index
+        with self._lock:
+            if self._index is None or time.monotonic() - self._loaded_at >= self.ttl:
+                now = datetime.now(timezone.utc)
+                rows = db.query(Promotion).filter(
+                    Promotion.active.is_(True),
+                    or_(Promotion.ends_at.is_(None), Promotion.ends_at > now),
+                ).all()
+                self._index = PromotionIndex(rows)
+                self._loaded_at = time.monotonic()
+                logger.info(f"Compiled {self._index.size} active promotions")
+            return self._index
+
+
+promotion_cache = from_settings(lambda: PromotionCache(settings.PROMOTION_CACHE_TTL))
@@ -0,0 +1,209 @@
+import importlib.util
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core import database
+from app.core.config import from_settings, settings
+from app.services.checkout import completed_orders
+
+logger = logging.getLogger(__name__)
+
+
+def recommendations_available() -> bool:
+    # numpy is imported where the model is built or loaded, not with this module, so it
+    # stays off the startup path. Without it the endpoint answers 503.
+    return importlib.util.find_spec("numpy") is not None
+
+
+class TopNeighbours:
+    """
+    Immutable top-K "bought together" lists in CSR form: the neighbours of
+    the product at dense row ``r`` are ``neighbours[indptr[r]:indptr[r + 1]]``,
+    best first. Lookups are one dict access and one slice.
+    """
+
+    def __init__(self, product_ids, indptr, neighbours, scores):
+        self.product_ids = product_ids
+        self.indptr = indptr
+        self.neighbours = neighbours
+        self.scores = scores
+        self.rows = {int(product_id): row for row, product_id in enumerate(product_ids)}
+
+    def related(self, product_id: int, limit: int) -> List[dict]:
+        row = self.rows.get(product_id)
+        if row is None:
+            return []
+        start = self.indptr[row]
+        end = min(self.indptr[row + 1], start + limit)
+        return [
+            {"product_id": int(product), "score": int(score)}
+            for product, score in zip(self.neighbours[start:end], self.scores[start:end])
+        ]
+
+
+class CoPurchaseModel:
+    """
+    Sparse product co-occurrence counts built from the baskets of
+    COMPLETED orders, read in settlement order.
+
+    Pairs are encoded as ``row << 32 | column`` over dense product rows and
+    kept as sorted (key, count) arrays, so both the initial build and each
+    incremental refresh are a handful of vectorized NumPy passes. Only the
+    top ``top_k`` neighbours per product are materialized for serving; the
+    full counts and the ``(completed_at, id)`` watermark are saved to ``path`` so a restart
+    resumes from where the last refresh stopped.
+    """
+
+    def __init__(self, source: sessionmaker, path: str, top_k: int, batch_size: int, max_basket: int):
+        self.source = source
+        self.path = path
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self.max_basket = max_basket
+        self.watermark: Optional[Tuple[datetime, int]] = None
+        self.top = None
+        self._rows: Dict[int, int] = {}
+        # Set by load(), so numpy is only imported once the model is used.
+        self._product_ids = self._keys = self._counts = None
+        self._lock = threading.Lock()
+
+    def related(self, product_id: int, limit: int) -> List[dict]:
+        top = self.top
+        return top.related(product_id, limit) if top is not None else []
+
+    def load(self) -> None:
+        import numpy as np
+        self._product_ids = self._keys = self._counts = np.zeros(0, dtype=np.int64)
+        if not os.path.exists(self.path):
+            return
+        with np.load(self.path) as saved:
+            self._product_ids = saved["product_ids"]
+            self._keys = saved["keys"]
+            self._counts = saved["counts"]
+            completed_at = str(saved["watermark_at"])
+            self.watermark = (datetime.fromisoformat(completed_at), int(saved["watermark"])) if completed_at else None
+        self._rows = {int(product_id): row for row, product_id in enumerate(self._product_ids)}
+        self.top = self._build_top()
+        logger.info(f"Loaded co-purchase counts for {len(self._rows)} products up to {self.watermark}")
+
+    def refresh(self) -> int:
+        """Fold orders completed since the last refresh into the counts."""
+        with self._lock:
+            if self._keys is None:
+                self.load()
+            added = 0
+            while True:
+                baskets = self._read_baskets()
+                if not baskets:
+                    break
+                self._add_baskets(baskets)
+                added += len(baskets)
+                if len(baskets) < self.batch_size:
+                    break
+            if added or self.top is None:
+                self.top = self._build_top()
+                self._save()
+                logger.info(f"Co-purchase model now covers {len(self._rows)} products (+{added} orders)")
+            return added
+
+    def _read_baskets(self) -> List[List[int]]:
+        with self.source() as db:
+            rows = completed_orders(db, ("cart",), self.watermark, self.batch_size)
+        if rows:
+            self.watermark = (rows[-1].completed_at, rows[-1].id)
+        baskets = []
+        for row in rows:
+            basket = sorted({
+                int(line["product_id"]) for line in row.cart or []
+                if isinstance(line, dict) and "product_id" in line
+            })[:self.max_basket]
+            if len(basket) > 1:
+                baskets.append(basket)
+        return baskets
+
+    def _add_baskets(self, baskets: List[List[int]]) -> None:
+        import numpy as np
+        for product_id in (product_id for basket in baskets for product_id in basket):
+            if product_id not in self._rows:
+                self._rows[product_id] = len(self._rows)
+        if len(self._rows) != len(self._product_ids):
+            self._product_ids = np.fromiter(self._rows, dtype=np.int64, count=len(self._rows))
+
+        sizes = np.fromiter((len(basket) for basket in baskets), dtype=np.int64, count=len(baskets))
+        items = np.fromiter(
+            (self._rows[product_id] for basket in baskets for product_id in basket),
+            dtype=np.int64,
+            count=int(sizes.sum()),
+        )
+        starts = np.cumsum(sizes) - sizes
+
+        # Every item is paired with every item of its own basket (itself included,
+        # dropped below): item i repeats size(i) times on the left, and its whole
+        # basket is laid out once on the right.
+        item_sizes = np.repeat(sizes, sizes)
+        item_starts = np.repeat(starts, sizes)
+        left = np.repeat(items, item_sizes)
+        block_starts = np.cumsum(item_sizes) - item_sizes
+        offsets = np.arange(left.size) - np.repeat(block_starts, item_sizes)
+        right = items[np.repeat(item_starts, item_sizes) + offsets]
+        distinct = left != right
+        keys = (left[distinct] << 32) | right[distinct]
+
+        new_keys, new_counts = np.unique(keys, return_counts=True)
+        merged_keys, inverse = np.unique(np.concatenate([self._keys, new_keys]), return_inverse=True)
+        merged_counts = np.bincount(inverse, weights=np.concatenate([self._counts, new_counts]))
+        self._keys = merged_keys
+        self._counts = merged_counts.astype(np.int64)
+
+    def _build_top(self) -> "TopNeighbours":
+        import numpy as np
+        rows = self._keys >> 32
+        columns = self._keys & 0xFFFFFFFF
+        order = np.lexsort((-self._counts, rows))
+        rows, columns, counts = rows[order], columns[order], self._counts[order]
+        per_row = np.bincount(rows, minlength=len(self._product_ids))
+        row_starts = np.cumsum(per_row) - per_row
+        rank = np.arange(rows.size) - np.repeat(row_starts, per_row)
+        keep = rank < self.top_k
+        kept_per_row = np.minimum(per_row, self.top_k)
+        indptr = np.concatenate([[0], np.cumsum(kept_per_row)])
+        return TopNeighbours(
+            self._product_ids.copy(),
+            indptr,
+            self._product_ids[columns[keep]],
+            counts[keep].astype(np.int32),
+        )
+
+    def _save(self) -> None:
+        import numpy as np
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Every worker refreshes and saves the model, so each writes its own temp file.
+        fd, tmp = tempfile.mkstemp(dir=directory or ".", prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+        completed_at, order_id = self.watermark or (None, 0)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f, product_ids=self._product_ids, keys=self._keys, counts=self._counts,
+                    watermark=order_id, watermark_at=completed_at.isoformat() if completed_at else "",
+                )
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+co_purchases = from_settings(lambda: CoPurchaseModel(
+    database.SessionLocal,
+    settings.RECOMMENDATIONS_PATH,
+    settings.RECOMMENDATIONS_TOP_K,
+    settings.RECOMMENDATIONS_BATCH_SIZE,
+    settings.RECOMMENDATIONS_MAX_BASKET,
+))
@@ -0,0 +1,255 @@
+import importlib.util
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core import database
+from app.core.config import from_settings, settings
+from app.services.checkout import completed_orders
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): run the exporter in a single worker
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_FILE = "_watermark.json"
+LOCK_FILE = "_export.lock"
+
+
+@lru_cache(maxsize=None)
+def line_item_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("order_id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("day", pa.date32()),
+        ("product_id", pa.int64()),
+        ("category", pa.dictionary(pa.int16(), pa.string())),
+        ("quantity", pa.int32()),
+        ("unit_price", pa.float64()),
+        ("line_total", pa.float64()),
+    ])
+
+
+def analytics_available() -> bool:
+    # pyarrow and numpy are imported where the data is written or read, not with
+    # this module, so they stay off the startup path. Without them the endpoints answer 503.
+    return all(importlib.util.find_spec(name) is not None for name in ("pyarrow", "numpy"))
+
+
+class SalesExporter:
+    """
+    Incrementally copies order line items into Parquet files.
+
+    Each run reads COMPLETED orders, from both ``orders`` and
+    ``orders_archive``, in settlement order past the last exported
+    ``(completed_at, id)`` (an index range scan, never an aggregate),
+    flattens their lines and writes one immutable file named after its last
+    order. The watermark file is replaced only after the data file is in
+    place, so a crash rewrites at most one batch and never skips one.
+
+    Every worker runs the exporter against the same directory, so a run
+    holds the ``_export.lock`` flock from reading the watermark to
+    advancing it; a worker that finds it taken skips its run.
+    """
+
+    def __init__(self, source: sessionmaker, directory: str, batch_size: int):
+        self.source = source
+        self.directory = directory
+        self.batch_size = batch_size
+        self.last_run_orders = 0
+        self.last_run_at: Optional[float] = None
+
+    def watermark(self) -> Optional[Tuple[datetime, int]]:
+        """The ``(completed_at, id)`` of the last exported order; None before the first export."""
+        try:
+            with open(os.path.join(self.directory, WATERMARK_FILE), encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return None
+        return datetime.fromisoformat(saved["completed_at"]), saved["order_id"]
+
+    def _set_watermark(self, order) -> None:
+        path = os.path.join(self.directory, WATERMARK_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"completed_at": order.completed_at.isoformat(), "order_id": order.id}, f)
+        os.replace(path + ".tmp", path)
+
+    def export_once(self) -> int:
+        lock_file = self._claim()
+        if lock_file is None:
+            logger.debug(f"Another worker is exporting to {self.directory}; skipping this run")
+            return 0
+        try:
+            exported = self._export()
+        finally:
+            lock_file.close()
+        self.last_run_orders = exported
+        self.last_run_at = time.time()
+        if exported:
+            logger.info(f"Exported {exported} orders to {self.directory}")
+        return exported
+
+    def _claim(self):
+        """The export flock, held until the returned file is closed; None if another worker holds it."""
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(os.path.join(self.directory, LOCK_FILE), "a+")
+        if fcntl is None:
+            return lock_file
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _export(self) -> int:
+        import pyarrow.parquet as pq
+        exported = 0
+        while True:
+            after = self.watermark()
+            orders = self._read_orders(after)
+            if not orders:
+                break
+            table = self._line_items(orders)
+            last = orders[-1]
+            path = os.path.join(
+                self.directory, f"line_items-{last.completed_at:%Y%m%dT%H%M%S%f}-{last.id:012d}.parquet"
+            )
+            pq.write_table(table, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            self._set_watermark(last)
+            exported += len(orders)
+            if len(orders) < self.batch_size:
+                break
+        return exported
+
+    def _read_orders(self, after: Optional[Tuple[datetime, int]]) -> list:
+        with self.source() as db:
+            return completed_orders(db, ("user_id", "cart", "created_at"), after, self.batch_size)
+
+    def _line_items(self, orders: list):
+        import pyarrow as pa
+        columns: Dict[str, list] = {name: [] for name in line_item_schema().names}
+        for order in orders:
+            created = order.created_at
+            if created.tzinfo is None:
+                created = created.replace(tzinfo=timezone.utc)
+            day = created.astimezone(timezone.utc).date()
+            for line in order.cart or []:
+                if not isinstance(line, dict) or "product_id" not in line:
+                    continue
+                quantity = int(line.get("quantity", 0))
+                unit_price = float(line.get("unit_price", line.get("price", 0)))
+                columns["order_id"].append(order.id)
+                columns["user_id"].append(order.user_id)
+                columns["day"].append(day)
+                columns["product_id"].append(int(line["product_id"]))
+                columns["category"].append(line.get("category") or "Unknown")
+                columns["quantity"].append(quantity)
+                columns["unit_price"].append(unit_price)
+                columns["line_total"].append(float(line.get("line_total", unit_price * quantity)))
+        return pa.table(columns, schema=line_item_schema())
+
+
+class SalesAnalytics:
+    """
+    Aggregations over the exported line items, computed with Arrow's
+    vectorized group-by and NumPy. The dataset is loaded once and reloaded
+    only when the set of export files changes.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._files: tuple = ()
+        self._table = None
+        self._lock = threading.Lock()
+
+    def table(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        try:
+            files = tuple(sorted(
+                name for name in os.listdir(self.directory)
+                if name.startswith("line_items-") and name.endswith(".parquet")
+            ))
+        except FileNotFoundError:
+            files = ()
+        with self._lock:
+            if files != self._files or self._table is None:
+                tables = [pq.read_table(os.path.join(self.directory, name)) for name in files]
+                self._table = pa.concat_tables(tables) if tables else line_item_schema().empty_table()
+                self._files = files
+            return self._table
+
+    def _between(self, table, start: Optional[date], end: Optional[date]):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        if start is not None:
+            table = table.filter(pc.greater_equal(table["day"], pa.scalar(start, pa.date32())))
+        if end is not None:
+            table = table.filter(pc.less_equal(table["day"], pa.scalar(end, pa.date32())))
+        return table
+
+    def top_sellers(self, category: Optional[str], limit: int, start: Optional[date], end: Optional[date]) -> Dict[str, List[dict]]:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        table = self._between(self.table(), start, end)
+        if category is not None:
+            table = table.filter(pc.equal(table["category"].cast(pa.string()), category))
+        table = table.set_column(table.schema.get_field_index("category"), "category", table["category"].cast(pa.string()))
+        totals = table.group_by(["category", "product_id"]).aggregate([
+            ("quantity", "sum"),
+            ("line_total", "sum"),
+        ]).sort_by([("category", "ascending"), ("quantity_sum", "descending")])
+
+        result: Dict[str, List[dict]] = {}
+        for row in totals.to_pylist():
+            ranked = result.setdefault(row["category"], [])
+            if len(ranked) < limit:
+                ranked.append({
+                    "product_id": row["product_id"],
+                    "units": row["quantity_sum"],
+                    "revenue": round(row["line_total_sum"], 2),
+                })
+        return result
+
+    def revenue_by_day(self, start: Optional[date], end: Optional[date]) -> List[dict]:
+        table = self._between(self.table(), start, end)
+        daily = table.group_by("day").aggregate([
+            ("line_total", "sum"),
+            ("order_id", "count_distinct"),
+        ]).sort_by("day")
+        return [
+            {"day": row["day"], "revenue": round(row["line_total_sum"], 2), "orders": row["order_id_count_distinct"]}
+            for row in daily.to_pylist()
+        ]
+
+    def basket_sizes(self, start: Optional[date], end: Optional[date]) -> dict:
+        import numpy as np
+        table = self._between(self.table(), start, end)
+        sizes = table.group_by("order_id").aggregate([("quantity", "sum")])["quantity_sum"].to_numpy()
+        if sizes.size == 0:
+            return {"orders": 0, "mean": 0.0, "p50": 0, "p90": 0, "distribution": {}}
+        counts = np.bincount(sizes)
+        nonzero = np.nonzero(counts)[0]
+        return {
+            "orders": int(sizes.size),
+            "mean": float(sizes.mean()),
+            "p50": int(np.percentile(sizes, 50)),
+            "p90": int(np.percentile(sizes, 90)),
+            "distribution": {int(size): int(counts[size]) for size in nonzero},
+        }
+
+
+sales_exporter = from_settings(lambda: SalesExporter(database.SessionLocal, settings.ANALYTICS_EXPORT_DIR, settings.ANALYTICS_EXPORT_BATCH_SIZE))
+sales_analytics = from_settings(lambda: SalesAnalytics(settings.ANALYTICS_EXPORT_DIR))
@@ -0,0 +1,58 @@
+import time
+
+import httpx
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import Settings
+from app.main import create_app
+
+JWT_SECRET = "test-secret-that-is-long-enough-for-hs256"
+
+
+@pytest.fixture
+def shard_urls():
+    """No cart shards by default; shard tests override this with SQLite files."""
+    return []
+
+
+@pytest.fixture
+def replica_urls():
+    """No read replicas by default."""
+    return []
+
+
+@pytest.fixture
+def app_settings(tmp_path, shard_urls, replica_urls):
+    return Settings(
+        DATABASE_URL=f"sqlite:///{tmp_path / 'primary.db'}",
+        DATABASE_REPLICA_URLS=replica_urls,
+        CART_SHARD_URLS=shard_urls,
+        JWT_SECRET=JWT_SECRET,
+        PAYMENT_PROVIDER_KEY="test",
+        RATE_LIMIT_ENABLED=False,
+        ANALYTICS_EXPORT_DIR=str(tmp_path / "sales"),
+        RECOMMENDATIONS_PATH=str(tmp_path / "co_purchases.npz"),
+    )
+
+
+@pytest.fixture
+def client(app_settings):
+    from app.services import fake_payment_provider
+    from app.services.payments import payment_gateway
+
+    app = create_app(app_settings)
+    fake_payment_provider.charges.clear()
+    payment_gateway.transport = httpx.ASGITransport(app=fake_payment_provider.app)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def auth():
+    """Authorization headers for ``user_id``."""
+    def headers(user_id: int) -> dict:
+        token = jwt.encode({"sub": str(user_id), "exp": int(time.time()) + 600}, JWT_SECRET, algorithm="HS256")
+        return {"Authorization": f"Bearer {token}"}
+    return headers
@@ -0,0 +1,79 @@
+import pytest
+
+from app.core import database
+from app.services.recommendations import co_purchases
+from app.services.sales_analytics import SalesExporter, sales_analytics, sales_exporter
+
+
+@pytest.fixture
+def app_settings(app_settings):
+    return app_settings.model_copy(update={"ORDER_SETTLE_GRACE_SECONDS": 0.0})
+
+
+def _fill_cart(client, headers, user_id, product_ids):
+    for product_id in product_ids:
+        response = client.post(
+            "/shop/cart/", json={"user_id": user_id, "product_id": product_id, "quantity": 1}, headers=headers
+        )
+        assert response.status_code == 201
+
+
+def _exported_orders():
+    return sorted(set(sales_analytics.table()["order_id"].to_pylist()))
+
+
+def test_exports_and_counts_only_completed_orders_in_settlement_order(client, auth):
+    products = [
+        client.post("/shop/products/", json={"name": name, "price": price, "stock": 10, "category": "Toys"}).json()["id"]
+        for name, price in (("Ball", 2.0), ("Rope", 3.0), ("Bell", 0.13))
+    ]
+    first, second, declined = auth(1), auth(2), auth(3)
+    _fill_cart(client, first, 1, products[:2])
+    _fill_cart(client, second, 2, products[:2])
+    _fill_cart(client, declined, 3, products)
+
+    older = client.post("/shop/cart/orders", json={}, headers=first).json()["order_id"]
+    newer = client.post("/shop/cart/orders", json={}, headers=second).json()["order_id"]
+    assert client.post("/shop/cart/pay/3", headers=declined).status_code == 402
+    assert client.post("/shop/cart/pay/2", headers=second).status_code == 200
+
+    # The older order is still awaiting payment and the third one failed: neither counts.
+    assert sales_exporter.export_once() == 1
+    assert _exported_orders() == [newer]
+    co_purchases.refresh()
+    assert co_purchases.related(products[0], 5) == [{"product_id": products[1], "score": 1}]
+
+    # Paid after a newer order was exported, it is still picked up.
+    assert client.post("/shop/cart/pay/1", headers=first).status_code == 200
+    assert sales_exporter.export_once() == 1
+    assert _exported_orders() == [older, newer]
+    co_purchases.refresh()
+    assert co_purchases.related(products[0], 5) == [{"product_id": products[1], "score": 2}]
+    assert sales_exporter.export_once() == 0
+
+
+def test_workers_sharing_the_export_directory_write_each_line_once(client, auth, app_settings):
+    products = [
+        client.post("/shop/products/", json={"name": name, "price": 1.0, "stock": 10, "category": "Toys"}).json()["id"]
+        for name in ("Frisbee", "Squeaker")
+    ]
+    for user_id in (1, 2):
+        headers = auth(user_id)
+        _fill_cart(client, headers, user_id, products)
+        assert client.post(f"/shop/cart/pay/{user_id}", headers=headers).status_code == 200
+
+    first, second = (
+        SalesExporter(database.SessionLocal, app_settings.ANALYTICS_EXPORT_DIR, app_settings.ANALYTICS_EXPORT_BATCH_SIZE)
+        for _ in range(2)
+    )
+    # While one worker is mid-export, the other skips its run rather than reading the same watermark.
+    running = first._claim()
+    assert second.export_once() == 0
+    running.close()
+
+    assert first.export_once() == 2
+    assert second.export_once() == 0
+    table = sales_analytics.table()
+    lines = list(zip(table["order_id"].to_pylist(), table["product_id"].to_pylist()))
+    assert len(lines) == 4
+    assert len(set(lines)) == len(lines)
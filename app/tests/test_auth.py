@@ -0,0 +1,34 @@
+import time
+
+import jwt
+
+
+def _bearer(secret, **claims):
+    claims = {"sub": "1", "exp": int(time.time()) + 600, **claims}
+    return {"Authorization": f"Bearer {jwt.encode(claims, secret, algorithm='HS256')}"}
+
+
+def test_protected_routes_need_a_valid_token(client, app_settings):
+    secret = app_settings.JWT_SECRET
+    missing = client.get("/shop/cart/1")
+    assert missing.status_code == 401
+    assert missing.headers["www-authenticate"] == "Bearer"
+
+    assert client.get("/shop/cart/1", headers=_bearer("not-the-secret-" + secret)).status_code == 401
+    assert client.get("/shop/cart/1", headers=_bearer(secret, exp=int(time.time()) - 60)).status_code == 401
+    assert client.get("/shop/cart/1", headers=_bearer(secret, sub="not-a-user")).status_code == 401
+    assert client.post("/shop/cart/orders", json={}, headers={"Authorization": "Bearer garbage"}).status_code == 401
+
+
+def test_users_cannot_reach_each_others_data(client, auth):
+    product_id = client.post(
+        "/shop/products/", json={"name": "Lead", "price": 1.0, "stock": 5, "category": "Walk"}
+    ).json()["id"]
+    headers = auth(1)
+
+    assert client.get("/shop/cart/2", headers=headers).status_code == 403
+    assert client.get("/shop/cart/orders/2", headers=headers).status_code == 403
+    assert client.post("/shop/cart/pay/2", headers=headers).status_code == 403
+    added = client.post("/shop/cart/", json={"user_id": 2, "product_id": product_id, "quantity": 1}, headers=headers)
+    assert added.status_code == 403
+    assert client.get("/shop/cart/orders/1", headers=headers).status_code == 200
@@ -0,0 +1,96 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, update
+
+from app.core import database
+from app.main import create_app
+from app.models.cart import Cart
+from app.models.outbox import OutboxEvent
+from app.services.cart_buffer import CartWriteBuffer, cart_buffer
+
+
+def _add_product(client, name="Kibble", stock=10, price=2.5):
+    response = client.post("/shop/products/", json={"name": name, "price": price, "stock": stock, "category": "Food"})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_cart_cache_sees_writes_made_outside_this_worker(client, auth):
+    headers = auth(1)
+    product_id = _add_product(client)
+    client.post("/shop/cart/", json={"user_id": 1, "product_id": product_id, "quantity": 1}, headers=headers)
+
+    first = client.get("/shop/cart/1", headers=headers)
+    assert first.json()[0]["quantity"] == 1
+    etag = first.headers["etag"]
+    assert client.get("/shop/cart/1", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    # Another worker (or the sweeper, or checkout) changes the line; this process is not told.
+    with database.SessionLocal() as db:
+        db.execute(update(Cart).where(Cart.user_id == 1).values(quantity=7).execution_options(synchronize_session=False))
+        db.commit()
+
+    revalidated = client.get("/shop/cart/1", headers={**headers, "If-None-Match": etag})
+    assert revalidated.status_code == 200
+    assert revalidated.json()[0]["quantity"] == 7
+    assert revalidated.headers["etag"] != etag
+
+
+def test_cart_cache_sees_product_changes(client, auth):
+    headers = auth(1)
+    product_id = _add_product(client)
+    client.post("/shop/cart/", json={"user_id": 1, "product_id": product_id, "quantity": 1}, headers=headers)
+    etag = client.get("/shop/cart/1", headers=headers).headers["etag"]
+
+    assert client.put(f"/shop/products/{product_id}", json={"price": 9.99}).status_code == 200
+
+    revalidated = client.get("/shop/cart/1", headers={**headers, "If-None-Match": etag})
+    assert revalidated.status_code == 200
+    assert revalidated.json()[0]["price"] == 9.99
+    assert revalidated.headers["etag"] != etag
+    assert client.get("/shop/cart/1/summary", headers=headers).json()["total"] == 9.99
+
+
+@pytest.fixture
+def write_behind_client(app_settings, tmp_path):
+    app = create_app(app_settings.model_copy(update={
+        "CART_WRITE_BEHIND": True,
+        "CART_WRITE_BEHIND_INTERVAL_MS": 3_600_000,  # only explicit flushes in these tests
+        "CART_WRITE_BEHIND_LOCK_PATH": str(tmp_path / "cart-write-behind.lock"),
+    }))
+    with TestClient(app) as client:
+        yield client
+
+
+def test_flush_records_events_only_for_lines_it_wrote(write_behind_client, auth):
+    client, headers = write_behind_client, auth(1)
+    kept, removed = (
+        client.post(
+            "/shop/cart/", json={"user_id": 1, "product_id": _add_product(client, name), "quantity": 1}, headers=headers
+        ).json()["id"]
+        for name in ("Kibble", "Leash")
+    )
+    for line_id in (kept, removed):
+        assert client.put(f"/shop/cart/{line_id}", json={"quantity": 4}, headers=headers).status_code == 200
+
+    # The line disappears behind the buffer's back (the sweeper, another worker).
+    with database.SessionLocal() as db:
+        db.execute(delete(Cart).where(Cart.id == removed))
+        db.commit()
+
+    assert cart_buffer.flush() == 1
+    with database.SessionLocal() as db:
+        assert db.query(Cart.id, Cart.quantity).order_by(Cart.id).all() == [(kept, 4)]
+        updated = db.query(OutboxEvent.payload).filter(OutboxEvent.event_type == "cart.item_updated").all()
+    assert [event.payload["quantity"] for event in updated] == [4]
+    assert cart_buffer.metrics()["dropped"] == 1
+
+
+def test_write_behind_refuses_a_second_worker(tmp_path):
+    lock_path = str(tmp_path / "cart-write-behind.lock")
+    first = CartWriteBuffer(database.cart_shards, database.SessionLocal, lock_path)
+    second = CartWriteBuffer(database.cart_shards, database.SessionLocal, lock_path)
+    first.claim()
+    first.claim()
+    with pytest.raises(RuntimeError, match="single worker"):
+        second.claim()
@@ -1,2 +1,57 @@
 # Tests for orders
 # ...existing code...
+import time
+
+import pytest
+
+from app.core import database
+
+# Wide enough that a request slowed by a busy runner still lands inside its pin window.
+LAG_SECONDS = 1.0
+
+
+@pytest.fixture
+def replica_urls(tmp_path):
+    # An empty database standing in for a replica that has not caught up at all.
+    return [f"sqlite:///{tmp_path / 'replica.db'}"]
+
+
+@pytest.fixture
+def app_settings(app_settings):
+    return app_settings.model_copy(update={"REPLICA_MAX_LAG_SECONDS": LAG_SECONDS})
+
+
+def test_new_order_is_listed_right_after_it_is_placed(client, auth):
+    headers = auth(1)
+    product_id = client.post(
+        "/shop/products/", json={"name": "Brush", "price": 3.0, "stock": 5, "category": "Grooming"}
+    ).json()["id"]
+    client.post("/shop/cart/", json={"user_id": 1, "product_id": product_id, "quantity": 1}, headers=headers)
+    # Let the pin from adding to the cart lapse so only the order placement can keep reads on the primary.
+    time.sleep(LAG_SECONDS * 2)
+    database.replica_router.check_all()
+    assert [replica["healthy"] for replica in database.replica_router.status()] == [True]
+
+    order_id = client.post("/shop/cart/orders", json={}, headers=headers).json()["order_id"]
+    history = client.get("/shop/cart/orders/1", headers=headers)
+    assert history.status_code == 200
+    assert [(order["id"], order["status"]) for order in history.json()] == [(order_id, "PENDING_PAYMENT")]
+
+
+def test_cart_change_pins_only_that_clients_reads(client, auth):
+    headers = auth(1)
+    product_id = client.post(
+        "/shop/products/", json={"name": "Comb", "price": 2.0, "stock": 5, "category": "Grooming"}
+    ).json()["id"]
+    time.sleep(LAG_SECONDS * 2)
+    database.replica_router.check_all()
+
+    client.post("/shop/cart/", json={"user_id": 1, "product_id": product_id, "quantity": 1}, headers=headers)
+    assert database.USER_PIN_COOKIE in client.cookies
+    cart = client.get("/shop/cart/1", headers=headers)
+    assert cart.status_code == 200
+    assert [item["product_id"] for item in cart.json()] == [product_id]
+
+    # The pin lives in the writer's cookie, not in the worker that served the write.
+    client.cookies.clear()
+    assert database.replica_router.choose() is not None
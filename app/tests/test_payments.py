@@ -1,2 +1,154 @@
 # Tests for payments
 # ...existing code...
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from sqlalchemy import update
+
+from app.core import database
+from app.models.cart import Cart
+from app.models.job import Job
+from app.models.order import Order
+from app.services.checkout import start_payment
+from app.services.payment_reconciler import payment_reconciler
+from app.services.payments import payment_gateway
+
+
+@pytest.fixture
+def app_settings(app_settings):
+    # Every order is old enough for the reconciler; only the attempt window protects one.
+    # Jobs go to the database with no workers to run them, so tests can see what was queued.
+    return app_settings.model_copy(update={
+        "PAYMENT_PENDING_SECONDS": 0.0,
+        "PAYMENT_ATTEMPT_SECONDS": 60.0,
+        "JOB_QUEUE_BACKEND": "database",
+        "JOB_WORKERS": 0,
+    })
+
+
+@pytest.fixture
+def product_id(client):
+    response = client.post("/shop/products/", json={"name": "Harness", "price": 10.0, "stock": 20, "category": "Walk"})
+    return response.json()["id"]
+
+
+def _stock(client, product_id):
+    return client.get(f"/shop/products/{product_id}").json()["stock"]
+
+
+def _age_payment_attempt(order_id):
+    """Make the order's payment attempt look long finished, so the reconciler takes it on."""
+    with database.SessionLocal() as db:
+        db.execute(
+            update(Order).where(Order.id == order_id)
+            .values(payment_started_at=datetime.now(timezone.utc) - timedelta(minutes=5))
+        )
+        db.commit()
+
+
+def _status(order_id):
+    with database.SessionLocal() as db:
+        return db.query(Order.status).filter(Order.id == order_id).scalar()
+
+
+def test_placing_an_order_twice_reuses_it(client, auth, product_id):
+    headers = auth(1)
+    client.post("/shop/cart/", json={"user_id": 1, "product_id": product_id, "quantity": 2}, headers=headers)
+
+    first = client.post("/shop/cart/orders", json={}, headers=headers).json()["order_id"]
+    assert client.post("/shop/cart/orders", json={}, headers=headers).json()["order_id"] == first
+    assert _stock(client, product_id) == 18
+
+
+def test_a_changed_cart_is_repriced_not_paid_at_the_old_order(client, auth, product_id):
+    headers = auth(1)
+    line_id = client.post(
+        "/shop/cart/", json={"user_id": 1, "product_id": product_id, "quantity": 2}, headers=headers
+    ).json()["id"]
+    stale = client.post("/shop/cart/orders", json={}, headers=headers).json()["order_id"]
+    client.put(f"/shop/cart/{line_id}", json={"quantity": 3}, headers=headers)
+
+    refused = client.post(f"/shop/cart/pay/1?order_id={stale}", headers=headers)
+    assert refused.status_code == 409
+    assert _status(stale) == "PENDING_PAYMENT"
+
+    paid = client.post("/shop/cart/pay/1", headers=headers)
+    assert paid.status_code == 200
+    assert paid.json()["order_id"] != stale
+    assert paid.json()["total"] == 30.0
+    assert _status(stale) == "FAILED"
+    assert _stock(client, product_id) == 17
+
+
+def test_a_line_changed_during_the_charge_stays_in_the_cart(client, auth, product_id):
+    headers = auth(1)
+    line_id = client.post(
+        "/shop/cart/", json={"user_id": 1, "product_id": product_id, "quantity": 1}, headers=headers
+    ).json()["id"]
+
+    class ChangeCartDuringCharge(httpx.AsyncBaseTransport):
+        def __init__(self, inner):
+            self.inner = inner
+
+        async def handle_async_request(self, request):
+            with database.SessionLocal() as db:
+                db.execute(update(Cart).where(Cart.id == line_id).values(quantity=4))
+                db.commit()
+            return await self.inner.handle_async_request(request)
+
+    payment_gateway.transport = ChangeCartDuringCharge(payment_gateway.transport)
+    paid = client.post("/shop/cart/pay/1", headers=headers)
+    assert paid.status_code == 200
+    assert paid.json()["total"] == 10.0
+    cart = client.get("/shop/cart/1", headers=headers).json()
+    assert [(item["id"], item["quantity"]) for item in cart] == [(line_id, 4)]
+
+
+def test_reconciler_leaves_orders_being_paid_alone(client, auth, product_id):
+    orders = {}
+    for user_id in (1, 2, 3):
+        headers = auth(user_id)
+        client.post("/shop/cart/", json={"user_id": user_id, "product_id": product_id, "quantity": 1}, headers=headers)
+        orders[user_id] = client.post("/shop/cart/orders", json={}, headers=headers).json()["order_id"]
+
+    with database.SessionLocal() as db:
+        # User 2's /pay has just stamped its order and is waiting on the provider;
+        # user 3's attempt started long enough ago that it cannot still be running.
+        assert start_payment(db, orders[2])
+        db.commit()
+    _age_payment_attempt(orders[3])
+
+    assert asyncio.run(payment_reconciler.reconcile_once()) == 2
+    assert [_status(orders[user_id]) for user_id in (1, 2, 3)] == ["FAILED", "PENDING_PAYMENT", "FAILED"]
+    assert _stock(client, product_id) == 19
+
+
+def test_reconciler_finishes_a_payment_whose_request_was_dropped(client, auth, product_id):
+    headers = auth(1)
+    client.post("/shop/cart/", json={"user_id": 1, "product_id": product_id, "quantity": 2}, headers=headers)
+
+    class ChargeThenDrop(httpx.AsyncBaseTransport):
+        def __init__(self, inner):
+            self.inner = inner
+
+        async def handle_async_request(self, request):
+            response = await self.inner.handle_async_request(request)
+            if request.method == "POST":  # the charge lands, but its response never arrives
+                raise httpx.ReadTimeout("client went away", request=request)
+            return response
+
+    payment_gateway.transport = ChargeThenDrop(payment_gateway.transport)
+    assert client.post("/shop/cart/pay/1", headers=headers).status_code == 503
+    order_id = client.get("/shop/cart/orders/1", headers=headers).json()[0]["id"]
+    assert _status(order_id) == "PENDING_PAYMENT"
+
+    _age_payment_attempt(order_id)
+    assert asyncio.run(payment_reconciler.reconcile_once()) == 1
+
+    assert _status(order_id) == "COMPLETED"
+    assert client.get("/shop/cart/1", headers=headers).status_code == 404
+    with database.SessionLocal() as db:
+        processed = db.query(Job.payload).filter(Job.name == "payment.processed").all()
+    assert [job.payload["order_id"] for job in processed] == [order_id]
@@ -1,2 +1,123 @@
 # Tests for products
 # ...existing code...
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import database
+from app.core.database import CATALOG_PIN_COOKIE
+from app.main import create_app
+from app.models.outbox import OutboxEvent
+
+
+def _create(client, name, price=1.0, category="Food"):
+    response = client.post("/shop/products/", json={"name": name, "price": price, "stock": 10, "category": category})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_listing_etag_is_computed_over_the_page_only(client):
+    ids = [_create(client, f"p{i}") for i in range(5)]
+    statements = []
+    listener = lambda conn, cursor, statement, params, context, many: statements.append(statement)
+    event.listen(Engine, "before_cursor_execute", listener)
+    try:
+        etag = client.get("/shop/products/?skip=0&limit=2").headers["etag"]
+    finally:
+        event.remove(Engine, "before_cursor_execute", listener)
+    aggregate = next(statement for statement in statements if "count(" in statement)
+    assert "LIMIT" in aggregate
+
+    # A change outside the page leaves its validator alone; one inside changes it.
+    assert client.put(f"/shop/products/{ids[4]}", json={"stock": 3}).status_code == 200
+    assert client.get("/shop/products/?skip=0&limit=2", headers={"If-None-Match": etag}).status_code == 304
+    assert client.put(f"/shop/products/{ids[1]}", json={"stock": 3}).status_code == 200
+    assert client.get("/shop/products/?skip=0&limit=2", headers={"If-None-Match": etag}).status_code == 200
+
+
+@pytest.fixture
+def snapshot_client(app_settings):
+    app = create_app(app_settings.model_copy(update={
+        "CATALOG_SNAPSHOT": True,
+        "CATALOG_SNAPSHOT_REFRESH_INTERVAL": 3600.0,  # the snapshot only changes when the test loads it
+    }))
+    with TestClient(app) as client:
+        yield client
+
+
+def test_only_the_writer_skips_the_catalog_snapshot(snapshot_client):
+    from app.services.catalog_snapshot import catalog_snapshot
+
+    client = snapshot_client
+    product_id = _create(client, "Collar", price=5.0)
+    catalog_snapshot.load()
+
+    assert client.put(f"/shop/products/{product_id}", json={"price": 6.0}).status_code == 200
+    assert CATALOG_PIN_COOKIE in client.cookies
+    assert client.get(f"/shop/products/{product_id}").json()["price"] == 6.0
+
+    # Any other client (no pin cookie) keeps reading the snapshot until it refreshes.
+    client.cookies.clear()
+    assert client.get(f"/shop/products/{product_id}").json()["price"] == 5.0
+    catalog_snapshot.load()
+    assert client.get(f"/shop/products/{product_id}").json()["price"] == 6.0
+
+
+def _updates_recorded(product_id):
+    with database.SessionLocal() as db:
+        return db.query(OutboxEvent).filter(
+            OutboxEvent.event_type == "product.updated", OutboxEvent.aggregate_id == str(product_id)
+        ).count()
+
+
+def test_update_honours_if_match(client):
+    product_id = _create(client, "Leash", price=4.0)
+    etag = client.get(f"/shop/products/{product_id}").headers["etag"]
+
+    updated = client.put(f"/shop/products/{product_id}", json={"price": 4.5}, headers={"If-Match": etag})
+    assert updated.status_code == 200
+    current = updated.headers["etag"]
+    assert current != etag
+
+    stale = client.put(f"/shop/products/{product_id}", json={"price": 5.0}, headers={"If-Match": etag})
+    assert stale.status_code == 409
+    assert stale.headers["etag"] == current
+    weak = client.put(f"/shop/products/{product_id}", json={"price": 5.0}, headers={"If-Match": f"W/{current}"})
+    assert weak.status_code == 409
+
+    assert client.put(f"/shop/products/{product_id}", json={"price": 5.5}, headers={"If-Match": "*"}).status_code == 200
+    assert client.get(f"/shop/products/{product_id}").json()["price"] == 5.5
+
+
+def test_empty_update_returns_the_product_unchanged(client):
+    product_id = _create(client, "Bowl", price=3.0)
+    etag = client.get(f"/shop/products/{product_id}").headers["etag"]
+
+    unchanged = client.put(f"/shop/products/{product_id}", json={}, headers={"If-Match": etag})
+    assert unchanged.status_code == 200
+    assert unchanged.json()["price"] == 3.0
+    assert unchanged.headers["etag"] == etag
+    assert _updates_recorded(product_id) == 0
+    assert client.put("/shop/products/999999", json={}).status_code == 404
+
+
+def test_each_content_coding_of_a_page_has_its_own_etag(client):
+    for i in range(20):
+        _create(client, f"Chew toy {i}", category="Toys")
+
+    tags = {}
+    for encoding in ("identity", "gzip", "br"):
+        page = client.get("/shop/products/by-category/Toys", headers={"Accept-Encoding": encoding})
+        assert page.status_code == 200
+        assert page.headers.get("content-encoding", "identity") == encoding
+        tags[encoding] = page.headers["etag"]
+    assert tags["gzip"] == tags["identity"][:-1] + '-gzip"'
+    assert tags["br"] == tags["identity"][:-1] + '-br"'
+
+    # Revalidating with any of them still gets a 304 while the page is unchanged.
+    for encoding, etag in tags.items():
+        revalidated = client.get(
+            "/shop/products/by-category/Toys", headers={"Accept-Encoding": encoding, "If-None-Match": etag}
+        )
+        assert revalidated.status_code == 304
@@ -0,0 +1,33 @@
+import pytest
+
+
+@pytest.fixture
+def app_settings(app_settings):
+    return app_settings.model_copy(update={
+        "RATE_LIMIT_ENABLED": True,
+        "RATE_LIMIT_DEFAULT": "1000/minute",
+        "RATE_LIMITS": {"GET /shop/products": "2/minute", "POST /shop/cart/pay": "1/minute"},
+    })
+
+
+def test_over_the_limit_gets_429_with_retry_after(client):
+    assert [client.get("/shop/products/").status_code for _ in range(2)] == [200, 200]
+
+    limited = client.get("/shop/products/")
+    assert limited.status_code == 429
+    assert limited.json() == {"detail": "Too many requests"}
+    assert 1 <= int(limited.headers["retry-after"]) <= 30
+    # Other rules and exempt paths keep their own budgets.
+    assert client.get("/shop/cart/orders/1").status_code != 429
+    assert client.get("/health/outbox").status_code == 200
+
+
+def test_verified_users_have_their_own_buckets(client, auth):
+    first, second = auth(1), auth(2)
+    # A token is keyed by user once it has been verified; until then, by address.
+    for user_id, headers in ((1, first), (2, second)):
+        assert client.get(f"/shop/cart/orders/{user_id}", headers=headers).status_code == 200
+
+    assert client.post("/shop/cart/pay/1", headers=first).status_code != 429
+    assert client.post("/shop/cart/pay/1", headers=first).status_code == 429
+    assert client.post("/shop/cart/pay/2", headers=second).status_code != 429
@@ -0,0 +1,111 @@
+import pytest
+
+from app.core import database
+from app.core.sharding import ShardSet
+from app.models.cart import Cart
+
+SHARDS = 2
+
+
+@pytest.fixture
+def shard_urls(tmp_path):
+    return [f"sqlite:///{tmp_path / f'shard{shard}.db'}" for shard in range(SHARDS)]
+
+
+@pytest.fixture
+def users(client):
+    """One user id per shard, so every test touches every shard."""
+    by_shard = {}
+    user_id = 1
+    while len(by_shard) < SHARDS:
+        by_shard.setdefault(database.cart_shards.shard_for(user_id), user_id)
+        user_id += 1
+    return [by_shard[shard] for shard in range(SHARDS)]
+
+
+@pytest.fixture
+def product_id(client):
+    response = client.post("/shop/products/", json={"name": "Chew toy", "price": 4.0, "stock": 50, "category": "Toys"})
+    return response.json()["id"]
+
+
+def test_public_ids_encode_and_decode_the_shard():
+    shards = ShardSet(["sqlite://"] * 3)
+    seen = set()
+    for shard in range(3):
+        for local_id in range(1, 6):
+            public_id = shards.public_id(shard, local_id)
+            assert public_id == local_id * 3 + shard
+            assert shards.locate(public_id) == (shard, local_id)
+            seen.add(public_id)
+    assert len(seen) == 15
+
+    unsharded = ShardSet([])
+    assert unsharded.count == 1
+    assert unsharded.public_id(0, 7) == 7
+    assert unsharded.locate(7) == (0, 7)
+
+
+def test_cart_lines_live_on_the_owners_shard(client, auth, users, product_id):
+    lines = {}
+    for user_id in users:
+        response = client.post(
+            "/shop/cart/", json={"user_id": user_id, "product_id": product_id, "quantity": 1}, headers=auth(user_id)
+        )
+        assert response.status_code == 201
+        lines[user_id] = response.json()["id"]
+
+    # Both lines are local id 1 on their own shard; the public ids still differ.
+    assert len(set(lines.values())) == SHARDS
+    for user_id, public_id in lines.items():
+        shard, local_id = database.cart_shards.locate(public_id)
+        assert shard == database.cart_shards.shard_for(user_id)
+        with database.cart_shards.sessionmakers[shard]() as db:
+            assert db.query(Cart.user_id).filter(Cart.id == local_id).scalar() == user_id
+        with database.cart_shards.sessionmakers[1 - shard]() as db:
+            assert db.query(Cart).filter(Cart.user_id == user_id).count() == 0
+
+
+def test_add_get_update_delete_across_shards(client, auth, users, product_id):
+    for user_id in users:
+        headers = auth(user_id)
+        line_id = client.post(
+            "/shop/cart/", json={"user_id": user_id, "product_id": product_id, "quantity": 1}, headers=headers
+        ).json()["id"]
+
+        cart = client.get(f"/shop/cart/{user_id}", headers=headers).json()
+        assert [(item["id"], item["product_name"], item["quantity"]) for item in cart] == [(line_id, "Chew toy", 1)]
+
+        updated = client.put(f"/shop/cart/{line_id}", json={"quantity": 3}, headers=headers)
+        assert updated.status_code == 200
+        assert updated.json() == {"id": line_id, "user_id": user_id, "product_id": product_id, "quantity": 3}
+        assert client.get(f"/shop/cart/{user_id}", headers=headers).json()[0]["quantity"] == 3
+
+        # Another user's line is not found, whichever shard the caller is on.
+        other = auth(users[1] if user_id == users[0] else users[0])
+        assert client.put(f"/shop/cart/{line_id}", json={"quantity": 9}, headers=other).status_code == 404
+        assert client.delete(f"/shop/cart/{line_id}", headers=other).status_code == 404
+
+        assert client.delete(f"/shop/cart/{line_id}", headers=headers).status_code == 204
+        assert client.get(f"/shop/cart/{user_id}", headers=headers).status_code == 404
+
+
+def test_orders_and_payment_across_shards(client, auth, users, product_id):
+    for user_id in users:
+        headers = auth(user_id)
+        client.post("/shop/cart/", json={"user_id": user_id, "product_id": product_id, "quantity": 2}, headers=headers)
+
+        order = client.post("/shop/cart/orders", json={}, headers=headers)
+        assert order.status_code == 200
+        order_id = order.json()["order_id"]
+
+        paid = client.post(f"/shop/cart/pay/{user_id}", headers=headers)
+        assert paid.status_code == 200
+        assert paid.json()["order_id"] == order_id
+        assert paid.json()["total"] == 8.0
+
+        assert client.get(f"/shop/cart/{user_id}", headers=headers).status_code == 404
+        history = client.get(f"/shop/cart/orders/{user_id}", headers=headers).json()
+        assert [(entry["id"], entry["status"]) for entry in history] == [(order_id, "COMPLETED")]
+
+    assert client.get(f"/shop/products/{product_id}").json()["stock"] == 50 - 2 * SHARDS
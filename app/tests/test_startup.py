@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+
+from app.core import auth, database
+from app.core.config import Settings, settings
+from app.main import create_app
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+
+# Generous enough for a slow CI runner; the baseline (everything imported
+# and tables created at import) took about 1 s for ``import app.main``.
+# Budgets are checked against the fastest of RUNS fresh interpreters, so
+# one run slowed by a busy machine does not fail the test.
+IMPORT_MAIN_BUDGET_MS = 700
+CREATE_APP_BUDGET_MS = 2500
+RUNS = 3
+
+# None of these may load before create_app() runs.
+DEFERRED = ("app.routers", "app.models", "app.services", "sqlalchemy.orm", "numpy", "pyarrow")
+
+
+def import_times(code: str) -> dict:
+    """Cumulative microseconds per module imported while running ``code``, keyed by module name."""
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("DATABASE_URL", "JWT_SECRET", "PAYMENT_PROVIDER_KEY")}
+    env["PYTHONPATH"] = ROOT
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    modules, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+        if len(name) - len(name.lstrip()) == 1:
+            total += int(cumulative)
+    modules["<total>"] = total
+    return modules
+
+
+def fastest_ms(code: str) -> float:
+    return min(import_times(code)["<total>"] for _ in range(RUNS)) / 1000
+
+
+def test_importing_main_defers_routers_models_and_settings():
+    # No DATABASE_URL etc. in the environment: importing must not read settings.
+    modules = import_times("import app.main")
+    early = sorted(name for name in modules if name.startswith(DEFERRED))
+    assert early == []
+    assert fastest_ms("import app.main") < IMPORT_MAIN_BUDGET_MS
+
+
+CREATE_APP = (
+    "from app.core.config import Settings; from app.main import create_app; "
+    "create_app(Settings(DATABASE_URL='sqlite://', JWT_SECRET='x', PAYMENT_PROVIDER_KEY='x'))"
+)
+
+
+def test_create_app_import_budget():
+    assert fastest_ms(CREATE_APP) < CREATE_APP_BUDGET_MS
+
+
+def test_create_app_leaves_numpy_and_pyarrow_to_the_features_that_use_them():
+    assert sorted(name for name in import_times(CREATE_APP) if name.startswith(("numpy", "pyarrow"))) == []
+
+
+def test_create_app_rebuilds_singletons_from_new_settings(tmp_path):
+    create_app(Settings(DATABASE_URL=f"sqlite:///{tmp_path / 'a.db'}", JWT_SECRET="first", PAYMENT_PROVIDER_KEY="x"))
+    database.init_engine()
+    assert auth.token_verifier.secret == "first"
+    first_engine = database.engine
+
+    shards = [f"sqlite:///{tmp_path / 'shard0.db'}", f"sqlite:///{tmp_path / 'shard1.db'}"]
+    create_app(Settings(
+        DATABASE_URL=f"sqlite:///{tmp_path / 'b.db'}",
+        JWT_SECRET="second",
+        PAYMENT_PROVIDER_KEY="x",
+        CART_SHARD_URLS=shards,
+    ))
+    database.init_engine()
+    assert settings.JWT_SECRET == "second"
+    assert auth.token_verifier.secret == "second"
+    assert database.cart_shards.urls == shards
+    assert len(database.cart_shards.engines) == 2
+    assert database.engine is not first_engine
+    assert str(database.engine.url).endswith("b.db")
@@ -0,0 +1,56 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import database
+from app.main import create_app, create_schema
+
+
+@pytest.fixture
+def quiet_client(app_settings):
+    """
+    A client without the lifespan, so no background task queries the
+    database while a request is being counted.
+    """
+    app = create_app(app_settings)
+    database.init_engine()
+    create_schema()
+    return TestClient(app)
+
+
+@pytest.fixture
+def statements():
+    """SQL statements sent to any engine, primary or shard, while the test runs."""
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement.split(None, 1)[0].upper())
+
+    event.listen(Engine, "before_cursor_execute", record)
+    yield seen
+    event.remove(Engine, "before_cursor_execute", record)
+
+
+def test_write_paths_do_not_reload_what_they_wrote(quiet_client, auth, statements):
+    headers = auth(1)
+
+    created = quiet_client.post("/shop/products/", json={"name": "Kibble", "price": 2.5, "stock": 10, "category": "Food"})
+    assert created.status_code == 201
+    # INSERT ... RETURNING for the product, then its outbox event.
+    assert statements == ["INSERT", "INSERT"]
+
+    statements.clear()
+    added = quiet_client.post(
+        "/shop/cart/", json={"user_id": 1, "product_id": created.json()["id"], "quantity": 1}, headers=headers
+    )
+    assert added.status_code == 201
+    # Product lookup, duplicate-line check, INSERT ... RETURNING, outbox event.
+    assert statements == ["SELECT", "SELECT", "INSERT", "INSERT"]
+
+    statements.clear()
+    updated = quiet_client.put(f"/shop/cart/{added.json()['id']}", json={"quantity": 3}, headers=headers)
+    assert updated.status_code == 200
+    assert updated.json()["quantity"] == 3
+    # UPDATE ... RETURNING, outbox event.
+    assert statements == ["UPDATE", "INSERT"]
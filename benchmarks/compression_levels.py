@@ -0,0 +1,61 @@
+"""
+CPU vs. bytes for compressing a catalog listing at each gzip level and
+brotli quality.
+
+    python benchmarks/compression_levels.py [product_count]
+"""
+import gzip
+import json
+import random
+import sys
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CATEGORIES = ("Food", "Toys", "Grooming")
+
+
+def catalog_page(count: int) -> bytes:
+    rng = random.Random(42)
+    products = [
+        {
+            "name": f"{rng.choice(CATEGORIES)} item {i} {rng.choice(['small', 'medium', 'large'])}",
+            "price": round(rng.uniform(1, 200), 2),
+            "stock": rng.randint(0, 500),
+            "category": rng.choice(CATEGORIES),
+            "id": i,
+        }
+        for i in range(1, count + 1)
+    ]
+    return json.dumps(products, separators=(",", ":")).encode()
+
+
+def measure(label: str, fn, body: bytes, rounds: int) -> None:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        out = fn(body)
+    elapsed = (time.perf_counter() - start) / rounds
+    ratio = len(out) / len(body)
+    print(f"{label:<12} {len(out):>10} B  {ratio:>6.1%}  {elapsed * 1000:>8.2f} ms  {len(body) / elapsed / 1e6:>8.1f} MB/s")
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    body = catalog_page(count)
+    rounds = 20
+    print(f"{count} products, {len(body)} B uncompressed\n")
+    print(f"{'encoding':<12} {'size':>12}  {'ratio':>6}  {'time':>11}  {'throughput':>10}")
+    for level in range(1, 10):
+        measure(f"gzip-{level}", lambda b, level=level: gzip.compress(b, compresslevel=level, mtime=0), body, rounds)
+    if brotli is None:
+        print("\nbrotli not installed; skipping")
+        return
+    for quality in range(0, 12):
+        measure(f"br-{quality}", lambda b, quality=quality: brotli.compress(b, quality=quality), body, rounds if quality < 10 else 2)
+
+
+if __name__ == "__main__":
+    main()
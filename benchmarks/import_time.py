@@ -0,0 +1,58 @@
+"""
+Worker boot cost from ``python -X importtime``: importing ``app.main``
+alone, and building the app with ``create_app()`` (which imports every
+router, service and model but creates no engine). Prints the slowest
+modules by cumulative time; with a budget, exits non-zero when a stage
+goes over it, so CI can hold the line.
+
+    python benchmarks/import_time.py [budget_ms_for_create_app] [top_n]
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+ENV = {"DATABASE_URL": "sqlite://", "PAYMENT_PROVIDER_KEY": "bench", "JWT_SECRET": "bench"}
+
+STAGES = (
+    ("import app.main", "import app.main"),
+    ("create_app()", "from app.main import create_app; create_app()"),
+)
+
+
+def import_times(code: str) -> dict:
+    """Cumulative microseconds per top-level import made while running ``code``."""
+    env = {**os.environ, **ENV, "PYTHONPATH": ROOT}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented under their importer; keep only the outermost.
+        if len(name) - len(name.lstrip()) == 1:
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def main() -> int:
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else None
+    top_n = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    over = False
+    for label, code in STAGES:
+        times = import_times(code)
+        total_ms = sum(times.values()) / 1000
+        print(f"{label}: {total_ms:.0f} ms in {len(times)} top-level imports")
+        for name, micros in sorted(times.items(), key=lambda item: -item[1])[:top_n]:
+            print(f"  {micros / 1000:8.1f} ms  {name}")
+        if budget_ms is not None and label == "create_app()" and total_ms > budget_ms:
+            print(f"  over budget: {total_ms:.0f} ms > {budget_ms:.0f} ms")
+            over = True
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Cart-line promotion lookup with 1,000 active promotions: the compiled
+PromotionIndex against checking every promotion for every line.
+
+    python benchmarks/promotions.py [promotion_count] [cart_lines]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+for name, value in (("DATABASE_URL", "sqlite://"), ("PAYMENT_PROVIDER_KEY", "bench"), ("JWT_SECRET", "bench")):
+    os.environ.setdefault(name, value)
+
+from app.services.promotions import CompiledPromotion, PromotionIndex  # noqa: E402
+
+CATEGORIES = ("Food", "Toys", "Grooming")
+PRODUCTS = 5000
+
+
+def make_promotions(count: int, rng: random.Random) -> list:
+    promotions = []
+    for i in range(count):
+        by_product = rng.random() < 0.9
+        kind = rng.choice(("percent_off", "buy_x_get_y"))
+        promotions.append(SimpleNamespace(
+            id=i,
+            name=f"promo {i}",
+            kind=kind,
+            product_id=rng.randrange(PRODUCTS) if by_product else None,
+            category=None if by_product else rng.choice(CATEGORIES),
+            percent_off=rng.choice((5, 10, 15, 20)) if kind == "percent_off" else None,
+            buy_quantity=2 if kind == "buy_x_get_y" else None,
+            free_quantity=1 if kind == "buy_x_get_y" else None,
+            starts_at=None,
+            ends_at=None,
+        ))
+    return promotions
+
+
+def naive_best(promotions, compiled, product_id, category, unit_price, quantity, now):
+    best = Decimal("0")
+    for promotion, rule in zip(promotions, compiled):
+        if promotion.product_id == product_id or (promotion.product_id is None and promotion.category == category):
+            if rule.live(now):
+                best = max(best, rule.discount(unit_price, quantity))
+    return best
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    line_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(7)
+    promotions = make_promotions(count, rng)
+    lines = [
+        (rng.randrange(PRODUCTS), rng.choice(CATEGORIES), Decimal("9.99"), rng.randint(1, 4))
+        for _ in range(line_count)
+    ]
+    now = datetime.now(timezone.utc)
+
+    start = time.perf_counter()
+    index = PromotionIndex(promotions)
+    compile_ms = (time.perf_counter() - start) * 1000
+    compiled = [CompiledPromotion(p) for p in promotions]
+
+    rounds = 2000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        indexed = [index.best(*line, now)[0] for line in lines]
+    indexed_us = (time.perf_counter() - start) / rounds * 1e6
+
+    rounds = 50
+    start = time.perf_counter()
+    for _ in range(rounds):
+        naive = [naive_best(promotions, compiled, *line, now) for line in lines]
+    naive_us = (time.perf_counter() - start) / rounds * 1e6
+
+    assert indexed == naive
+    print(f"{count} promotions, {line_count} cart lines")
+    print(f"compile index      {compile_ms:>10.2f} ms (once per cache refresh)")
+    print(f"indexed per cart   {indexed_us:>10.1f} us")
+    print(f"naive per cart     {naive_us:>10.1f} us  ({naive_us / indexed_us:.0f}x slower)")
+
+
+if __name__ == "__main__":
+    main()